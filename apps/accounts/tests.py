@@ -174,6 +174,20 @@ class AccountsAPITest(TestCase):
         self.assertEqual(response.data["username"], "existinguser")
         self.assertEqual(response.data["email"], "existing@example.com")
     
+    def test_get_profile_conditional(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get("/api/v2/auth/profile/")
+        etag = response["ETag"]
+
+        response = self.client.get("/api/v2/auth/profile/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.put("/api/v2/auth/profile/", {"city": "Huambo"}, format="json")
+        response = self.client.get("/api/v2/auth/profile/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+    
     def test_get_profile_unauthenticated(self):
         response = self.client.get("/api/v2/auth/profile/")
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -5,6 +5,7 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from infostore.conditional import make_etag, not_modified, set_validators
 from .serializers import (
     CustomTokenObtainPairSerializer,
     RegistrationSerializer,
@@ -52,8 +53,14 @@ def handle_profile(request):
     user = request.user
 
     if request.method == "GET":
+        # The user row is already loaded by authentication, so the profile
+        # itself is the cheapest version to derive the ETag from.
         serializer = UserSerializer(user)
-        return Response(serializer.data)
+        etag = make_etag(request, *serializer.data.values())
+        response = not_modified(request, etag)
+        if response:
+            return response
+        return set_validators(Response(serializer.data), etag)
 
     elif request.method == "PUT":
         data = request.data
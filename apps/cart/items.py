@@ -0,0 +1,153 @@
+"""
+Cart item writes.
+
+``add_quantities`` adds to the quantity of several products in a cart with a
+single statement on SQLite and PostgreSQL::
+
+    INSERT INTO cart_cartitem (cart_id, product_id, quantity) VALUES ...
+    ON CONFLICT (cart_id, product_id)
+    DO UPDATE SET quantity = cart_cartitem.quantity + excluded.quantity
+
+The ``(cart, product)`` unique constraint turns a second row for the same
+product into an increment of the first, so double-clicks and parallel tabs
+neither lose increments nor create duplicates. Other databases fall back to
+an ``F()`` update per product, inserting when no row was updated and
+retrying the update if a concurrent insert won.
+"""
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from apps.products.models import Product
+from .models import Cart, CartItem
+
+
+UPSERT_VENDORS = ("sqlite", "postgresql")
+
+
+def touch_cart(cart_id):
+    """
+    Move the cart's ``updated_at``, which ``purge_carts`` reads as the last
+    activity. Call it first, in the same transaction as the item writes: the
+    row lock it takes orders the request against a concurrent purge, which
+    locks its carts with ``SELECT ... FOR UPDATE SKIP LOCKED`` and re-checks
+    ``updated_at`` before deleting them. Either the purge skips or no longer
+    matches the cart, or it deleted the cart first and this returns False.
+    """
+    return bool(Cart.objects.filter(pk=cart_id).update(updated_at=timezone.now()))
+
+
+def add_quantities(cart_id, quantities):
+    """Add ``quantities`` (``{product_id: units}``) to the cart's items."""
+    if not quantities:
+        return
+    if connection.vendor in UPSERT_VENDORS:
+        _upsert(cart_id, quantities)
+        return
+    for product_id, quantity in quantities.items():
+        _increment(cart_id, product_id, quantity)
+
+
+def _upsert(cart_id, quantities):
+    quote = connection.ops.quote_name
+    table = quote(CartItem._meta.db_table)
+    rows = ", ".join(["(%s, %s, %s)"] * len(quantities))
+    params = []
+    for product_id, quantity in quantities.items():
+        params.extend([cart_id, product_id, quantity])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (cart_id, product_id, quantity) VALUES {rows}
+            ON CONFLICT (cart_id, product_id)
+            DO UPDATE SET quantity = {table}.quantity + excluded.quantity
+            """,
+            params,
+        )
+
+
+def _increment(cart_id, product_id, quantity):
+    items = CartItem.objects.filter(cart_id=cart_id, product_id=product_id)
+    if items.update(quantity=F("quantity") + quantity):
+        return
+    try:
+        with transaction.atomic():
+            CartItem.objects.create(
+                cart_id=cart_id, product_id=product_id, quantity=quantity
+            )
+    except IntegrityError:
+        # Another request inserted the row in between.
+        items.update(quantity=F("quantity") + quantity)
+
+
+def require_products(product_ids):
+    """Raise ``Product.DoesNotExist`` unless all ``product_ids`` exist."""
+    product_ids = set(product_ids)
+    if product_ids and Product.objects.filter(pk__in=product_ids).count() != len(
+        product_ids
+    ):
+        raise Product.DoesNotExist
+
+
+def fold_operations(quantities, operations):
+    """
+    Apply ``operations`` in order to ``quantities`` (``{product_id: units}``)
+    and return the result; removed products are left with 0 units.
+    """
+    quantities = dict(quantities)
+    for operation in operations:
+        product_id = operation["product_id"]
+        if operation["op"] == "add":
+            quantities[product_id] = (
+                quantities.get(product_id, 0) + operation["quantity"]
+            )
+        elif operation["op"] == "set":
+            quantities[product_id] = operation["quantity"]
+        else:
+            quantities[product_id] = 0
+    return quantities
+
+
+def apply_operations(cart, operations):
+    """
+    Apply ``add`` / ``set`` / ``remove`` operations (``CartOperationSerializer``
+    data) to ``cart``; run it inside ``transaction.atomic()``.
+
+    The operations are folded (``fold_operations``) into the final quantity
+    of each product, which is then written with one bulk insert, one bulk update
+    and one delete. Raises ``Product.DoesNotExist`` for unknown products.
+    """
+    product_ids = {operation["product_id"] for operation in operations}
+    items = {
+        item.product_id: item
+        for item in cart.cartitems.filter(product_id__in=product_ids)
+    }
+
+    quantities = fold_operations(
+        {product_id: item.quantity for product_id, item in items.items()},
+        operations,
+    )
+    require_products(
+        product_id
+        for product_id, quantity in quantities.items()
+        if quantity and product_id not in items
+    )
+
+    created, updated, deleted = [], [], []
+    for product_id, quantity in quantities.items():
+        item = items.get(product_id)
+        if item is None:
+            if quantity:
+                created.append(
+                    CartItem(cart=cart, product_id=product_id, quantity=quantity)
+                )
+        elif not quantity:
+            deleted.append(item)
+        elif item.quantity != quantity:
+            item.quantity = quantity
+            updated.append(item)
+
+    if deleted:
+        CartItem.objects.filter(pk__in=[item.pk for item in deleted]).delete()
+    CartItem.objects.bulk_create(created)
+    CartItem.objects.bulk_update(updated, ["quantity"])
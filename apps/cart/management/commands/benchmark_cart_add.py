@@ -0,0 +1,114 @@
+import threading
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, OperationalError, connection
+from apps.cart.items import add_quantities
+from apps.cart.models import Cart, CartItem
+from apps.products.models import Product
+
+
+def read_modify_write(cart_id, product_id):
+    """What add_to_cart used to do: get_or_create, add in Python, save()."""
+    item, created = CartItem.objects.get_or_create(
+        cart_id=cart_id, product_id=product_id, defaults={"quantity": 0}
+    )
+    item.quantity += 1
+    item.save()
+
+
+def upsert(cart_id, product_id):
+    add_quantities(cart_id, {product_id: 1})
+
+
+STRATEGIES = {"upsert": upsert, "read_modify_write": read_modify_write}
+# What add_to_cart runs; read_modify_write is the baseline, which is expected
+# to lose adds.
+TESTED = "upsert"
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress add_to_cart: --threads workers each add one unit of the same "
+        "product to the same cart --adds times, with each strategy in turn. "
+        "Reports adds/s and how many increments were lost, failed adds "
+        "included. Exits with an error if the upsert loses any. Creates and "
+        "deletes a temporary cart and product in the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--adds", type=int, default=200, help="Per thread.")
+        parser.add_argument("--strategy", choices=sorted(STRATEGIES), action="append")
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            self.stdout.write(
+                self.style.WARNING(
+                    "SQLite serializes all writes; run against PostgreSQL for "
+                    "throughput numbers that mean something."
+                )
+            )
+        lost = {
+            name: self.run(name, STRATEGIES[name], options)
+            for name in options["strategy"] or sorted(STRATEGIES)
+        }
+        if lost.get(TESTED):
+            raise CommandError(f"{TESTED} lost {lost[TESTED]} adds.")
+
+    def run(self, name, add, options):
+        product = Product.objects.create(
+            name="Benchmark cart",
+            slug=f"benchmark-cart-{uuid.uuid4().hex[:12]}",
+            description="Temporary product created by benchmark_cart_add.",
+            price=1,
+            featured=False,
+        )
+        cart = Cart.objects.create(cart_code=uuid.uuid4().hex[:11])
+        errors = [0] * options["threads"]
+        start = threading.Barrier(options["threads"] + 1)
+
+        def worker(index):
+            start.wait()
+            try:
+                for _ in range(options["adds"]):
+                    try:
+                        add(cart.pk, product.pk)
+                    except (IntegrityError, OperationalError):
+                        # A duplicate insert, or "database is locked" on
+                        # SQLite: the click is lost either way.
+                        errors[index] += 1
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(index,))
+            for index in range(options["threads"])
+        ]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        attempts = options["threads"] * options["adds"]
+        rows = list(cart.cartitems.values_list("quantity", flat=True))
+        # A failed add is a lost click too: the user saw no increment.
+        lost = attempts - sum(rows)
+        cart.delete()
+        product.delete()
+
+        line = (
+            f"{name:<18} {attempts} adds in {elapsed:6.2f}s  "
+            f"{attempts / elapsed:8.1f} adds/s  {lost} lost "
+            f"({sum(errors)} failed)  {len(rows)} row(s)"
+        )
+        if lost and name == TESTED:
+            self.stdout.write(self.style.ERROR(line))
+        elif lost:
+            self.stdout.write(self.style.WARNING(f"{line}  (baseline)"))
+        else:
+            self.stdout.write(line)
+        return lost
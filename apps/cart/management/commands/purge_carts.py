@@ -0,0 +1,101 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from apps.cart.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete abandoned anonymous carts and their items: carts without a "
+        "user idle for --days, and empty ones idle for --empty-hours. Works "
+        "through the Cart.updated_at index in batches of --batch-size, one "
+        "short transaction each, so it can run while the site is live. Run it "
+        "periodically (e.g. nightly)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=30,
+            help="Anonymous carts idle for longer are deleted.",
+        )
+        parser.add_argument(
+            "--empty-hours",
+            type=int,
+            default=24,
+            help="Anonymous carts without items idle for longer are deleted.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.1,
+            help="Seconds to pause between batches, leaving room for traffic.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the carts that would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        now = timezone.now()
+        idle_since = now - timedelta(days=options["days"])
+        empty_since = now - timedelta(hours=options["empty_hours"])
+
+        has_items = Exists(CartItem.objects.filter(cart=OuterRef("pk")))
+        abandoned = Cart.objects.filter(user__isnull=True).filter(
+            Q(updated_at__lt=idle_since) | Q(~has_items, updated_at__lt=empty_since)
+        )
+
+        if options["dry_run"]:
+            self.stdout.write(f"{abandoned.count()} carts would be deleted.")
+            return
+
+        carts = items = 0
+        while True:
+            batch = list(
+                abandoned.order_by("updated_at").values_list("pk", flat=True)[
+                    : options["batch_size"]
+                ]
+            )
+            if not batch:
+                break
+            deleted = self.delete_batch(abandoned, batch)
+            carts += deleted.get("cart.Cart", 0)
+            items += deleted.get("cart.CartItem", 0)
+            if len(batch) < options["batch_size"]:
+                break
+            time.sleep(options["sleep"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {carts} carts and {items} items in "
+                f"{time.monotonic() - started:.1f}s."
+            )
+        )
+
+    def delete_batch(self, abandoned, batch):
+        """
+        Delete the carts of ``batch`` that are still abandoned.
+
+        The carts are locked first and only the locked ones are deleted.
+        Locking re-evaluates the filter on rows changed since ``batch`` was
+        read (PostgreSQL re-checks the WHERE clause of ``FOR UPDATE`` on rows
+        updated concurrently), so a cart used meanwhile is left alone. A cart
+        that a request is writing to right now is skipped rather than waited
+        for; the request's ``touch_cart`` has just made it recent anyway.
+        """
+        with transaction.atomic():
+            locked = list(
+                abandoned.filter(pk__in=batch)
+                .select_for_update(skip_locked=True)
+                .values_list("pk", flat=True)
+            )
+            _, deleted = Cart.objects.filter(pk__in=locked).delete()
+        return deleted
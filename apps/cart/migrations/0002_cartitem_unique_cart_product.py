@@ -0,0 +1,39 @@
+# Generated by Django 4.2.23 on 2026-10-18 11:03
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_items(apps, schema_editor):
+    # Fold duplicate (cart, product) rows into the oldest one, summing the
+    # quantities, so the unique constraint can be created.
+    CartItem = apps.get_model("cart", "CartItem")
+    duplicates = (
+        CartItem.objects.values("cart_id", "product_id")
+        .annotate(rows=Count("id"), quantity=Sum("quantity"))
+        .filter(rows__gt=1)
+    )
+    for duplicate in list(duplicates):
+        items = CartItem.objects.filter(
+            cart_id=duplicate["cart_id"], product_id=duplicate["product_id"]
+        ).order_by("id")
+        keep = items.first()
+        items.exclude(pk=keep.pk).delete()
+        CartItem.objects.filter(pk=keep.pk).update(quantity=duplicate["quantity"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="cartitem",
+            constraint=models.UniqueConstraint(
+                fields=("cart", "product"), name="unique_cart_product"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-18 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0002_cartitem_unique_cart_product"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="cart",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
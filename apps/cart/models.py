@@ -13,7 +13,8 @@ class Cart(models.Model):
     )
     cart_code = models.CharField(max_length=11, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    # Last activity (items.touch_cart); purge_carts scans it.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         constraints = [
@@ -33,5 +34,13 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="item")
     quantity = models.IntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            # The conflict target of items.add_quantities().
+            models.UniqueConstraint(
+                fields=["cart", "product"], name="unique_cart_product"
+            )
+        ]
+
     def __str__(self):
         return f"{self.quantity} x {self.product.name} in cart {self.cart.cart_code}"
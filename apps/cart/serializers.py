@@ -1,3 +1,7 @@
+from decimal import Decimal
+from django.db import models
+from django.db.models import Count, F, Prefetch, Sum, Value, prefetch_related_objects
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
 from .models import Cart, CartItem
 from apps.products.serializers import ProductListSerializer
@@ -25,19 +29,73 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ["id", "cart_code", "cartitems", "cart_total"]
 
     def get_cart_total(self, cart):
+        # The items ``cartitems`` was serialized from, when prefetched.
         items = cart.cartitems.all()
         total = sum([item.quantity * item.product.price for item in items])
         return total
 
 
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=["add", "set", "remove"])
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, data):
+        if data["op"] != "remove" and "quantity" not in data:
+            raise serializers.ValidationError(
+                {"quantity": "Obrigatório nas operações add e set."}
+            )
+        return data
+
+
+class CartBatchSerializer(serializers.Serializer):
+    cart_code = serializers.CharField()
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
+
+
+def prefetch_cart_items(*carts):
+    """
+    Load the items of ``carts`` with their products in one query, so
+    ``CartSerializer`` reads items, sub totals and the total from the same
+    rows. List products only show their excerpt, so the description column
+    is left out.
+    """
+    prefetch_related_objects(
+        carts,
+        Prefetch(
+            "cartitems",
+            queryset=CartItem.objects.select_related("product").defer(
+                "product__description"
+            ),
+        ),
+    )
+
+
 class CartStatSerializer(serializers.ModelSerializer):
-    total_quantity = serializers.SerializerMethodField()
+    # Annotated by with_cart_stats(), so no item is loaded.
+    item_count = serializers.IntegerField(read_only=True)
+    total_quantity = serializers.IntegerField(read_only=True)
+    cart_total = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True
+    )
 
     class Meta:
         model = Cart
-        fields = ["id", "cart_code", "total_quantity"]
+        fields = ["id", "cart_code", "item_count", "total_quantity", "cart_total"]
 
-    def get_total_quantity(self, cart):
-        items = cart.cartitems.all()
-        total = sum([item.quantity for item in items])
-        return total
+
+def with_cart_stats(queryset):
+    """Annotate the ``CartStatSerializer`` fields with one aggregate query."""
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    return queryset.annotate(
+        item_count=Count("cartitems"),
+        total_quantity=Coalesce(Sum("cartitems__quantity"), 0),
+        cart_total=Coalesce(
+            Sum(
+                F("cartitems__quantity") * F("cartitems__product__price"),
+                output_field=amount,
+            ),
+            Value(Decimal("0")),
+            output_field=amount,
+        ),
+    )
@@ -1,8 +1,23 @@
-from django.test import TestCase
+import datetime
+import threading
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth import get_user_model
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework import status
+from .fast import fast_cart
+from .items import add_quantities
+from .management.commands.purge_carts import Command as PurgeCommand
 from .models import Cart, CartItem
+from .serializers import CartSerializer
+from .tokens import loads_cart
 from apps.products.models import Product
 
 
@@ -310,3 +325,678 @@ class CartAPITest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(Cart.objects.filter(user=self.user).exists())
 
+
+
+class FastCartSerializerTest(TestCase):
+    def setUp(self):
+        self.cart = Cart.objects.create(cart_code="FAST1234567")
+        laptop = Product.objects.create(
+            name="Laptop", description="<b>Laptop</b>", price="999.99"
+        )
+        mouse = Product.objects.create(name="Mouse", description="Mouse", price=25)
+        CartItem.objects.create(cart=self.cart, product=laptop, quantity=3)
+        CartItem.objects.create(cart=self.cart, product=mouse, quantity=1)
+
+    def assertSameJSON(self, cart):
+        self.assertEqual(
+            JSONRenderer().render(fast_cart(cart)),
+            JSONRenderer().render(CartSerializer(cart).data),
+        )
+
+    def test_matches_cart_serializer(self):
+        self.assertSameJSON(self.cart)
+
+    def test_empty_cart(self):
+        self.assertSameJSON(Cart.objects.create(cart_code="EMPTY123456"))
+
+    def test_cart_endpoint(self):
+        client = APIClient()
+        with override_settings(FAST_SERIALIZERS=False):
+            expected = client.get("/api/v2/cart/", {"code": self.cart.cart_code})
+        with override_settings(FAST_SERIALIZERS=True), self.assertNumQueries(2):
+            response = client.get("/api/v2/cart/", {"code": self.cart.cart_code})
+        self.assertEqual(response.content, expected.content)
+
+
+class CartQueriesTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.cart = Cart.objects.create(cart_code="QUERIES1234")
+        self.products = [
+            Product.objects.create(name=f"Product {i}", description="", price=i + 1)
+            for i in range(30)
+        ]
+        CartItem.objects.bulk_create(
+            CartItem(cart=self.cart, product=product, quantity=2)
+            for product in self.products
+        )
+
+    def test_get_cart(self):
+        # The cart, then its items joined to their products.
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/v2/cart/", {"code": self.cart.cart_code})
+        self.assertEqual(len(response.data["cartitems"]), 30)
+        self.assertEqual(response.data["cart_total"], 2 * sum(range(1, 31)))
+
+    def test_query_count_does_not_grow_with_items(self):
+        with CaptureQueriesContext(connection) as full:
+            self.client.post(
+                "/api/v2/cart/add/",
+                {"cart_code": self.cart.cart_code, "product_id": self.products[0].id},
+                format="json",
+            )
+        CartItem.objects.exclude(product=self.products[0]).delete()
+        with CaptureQueriesContext(connection) as single:
+            self.client.post(
+                "/api/v2/cart/add/",
+                {"cart_code": self.cart.cart_code, "product_id": self.products[0].id},
+                format="json",
+            )
+        self.assertEqual(len(full), len(single))
+
+
+class CartBatchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.cart = Cart.objects.create(cart_code="BATCH123456")
+        self.laptop, self.mouse, self.bag, self.cable = [
+            Product.objects.create(name=name, description="", price=price)
+            for name, price in [
+                ("Laptop", 100),
+                ("Mouse", 10),
+                ("Bag", 20),
+                ("Cable", 1),
+            ]
+        ]
+        CartItem.objects.create(cart=self.cart, product=self.laptop, quantity=1)
+        CartItem.objects.create(cart=self.cart, product=self.mouse, quantity=2)
+        CartItem.objects.create(cart=self.cart, product=self.bag, quantity=1)
+
+    def batch(self, operations, cart_code="BATCH123456"):
+        return self.client.post(
+            "/api/v2/cart/batch/",
+            {"cart_code": cart_code, "operations": operations},
+            format="json",
+        )
+
+    def quantities(self):
+        return dict(self.cart.cartitems.values_list("product__name", "quantity"))
+
+    def test_operations(self):
+        response = self.batch(
+            [
+                {"op": "add", "product_id": self.laptop.id, "quantity": 2},
+                {"op": "set", "product_id": self.mouse.id, "quantity": 5},
+                {"op": "remove", "product_id": self.bag.id},
+                {"op": "add", "product_id": self.cable.id, "quantity": 1},
+                {"op": "add", "product_id": self.cable.id, "quantity": 3},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.quantities(), {"Laptop": 3, "Mouse": 5, "Cable": 4})
+        self.assertEqual(response.data["cart_code"], self.cart.cart_code)
+        self.assertEqual(len(response.data["cartitems"]), 3)
+        self.assertEqual(response.data["cart_total"], 300 + 50 + 4)
+
+    def test_operations_apply_in_order(self):
+        self.batch(
+            [
+                {"op": "remove", "product_id": self.laptop.id},
+                {"op": "add", "product_id": self.laptop.id, "quantity": 2},
+                {"op": "set", "product_id": self.mouse.id, "quantity": 1},
+                {"op": "add", "product_id": self.mouse.id, "quantity": 1},
+            ]
+        )
+        self.assertEqual(self.quantities(), {"Laptop": 2, "Mouse": 2, "Bag": 1})
+
+    def test_query_count_does_not_grow_with_operations(self):
+        products = [
+            Product.objects.create(name=f"Product {i}", description="", price=1)
+            for i in range(20)
+        ]
+        operations = [
+            {"op": "add", "product_id": product.id, "quantity": 1}
+            for product in products
+        ] + [
+            {"op": "set", "product_id": self.laptop.id, "quantity": 4},
+            {"op": "remove", "product_id": self.bag.id},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.batch(operations)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(len(queries), 10)
+        self.assertEqual(len(self.quantities()), 22)
+
+    def test_unknown_product_changes_nothing(self):
+        response = self.batch(
+            [
+                {"op": "remove", "product_id": self.laptop.id},
+                {"op": "add", "product_id": 999999, "quantity": 1},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.quantities(), {"Laptop": 1, "Mouse": 2, "Bag": 1})
+
+    def test_invalid_operations(self):
+        for operations in [
+            [],
+            [{"op": "add", "product_id": self.laptop.id}],
+            [{"op": "set", "product_id": self.laptop.id, "quantity": 0}],
+            [{"op": "move", "product_id": self.laptop.id}],
+        ]:
+            with self.subTest(operations=operations):
+                response = self.batch(operations)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_cart(self):
+        response = self.batch([{"op": "remove", "product_id": 1}], "NOPE")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_other_users_cart(self):
+        owner = User.objects.create_user(
+            username="owner", email="owner@example.com", password="password123"
+        )
+        self.cart.user = owner
+        self.cart.save()
+        response = self.batch([{"op": "remove", "product_id": self.laptop.id}])
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class CartUpsertTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.cart = Cart.objects.create(cart_code="UPSERT12345")
+        self.laptop = Product.objects.create(name="Laptop", description="", price=100)
+        self.mouse = Product.objects.create(name="Mouse", description="", price=10)
+
+    def quantities(self):
+        return dict(self.cart.cartitems.values_list("product__name", "quantity"))
+
+    def test_add_increments_a_single_row(self):
+        for quantity in (1, 2):
+            response = self.client.post(
+                "/api/v2/cart/add/",
+                {
+                    "cart_code": self.cart.cart_code,
+                    "product_id": self.laptop.id,
+                    "quantity": quantity,
+                },
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.quantities(), {"Laptop": 3})
+        self.assertEqual(response.data["cart_total"], 300)
+
+    def test_single_statement(self):
+        CartItem.objects.create(cart=self.cart, product=self.laptop, quantity=1)
+        with self.assertNumQueries(1):
+            add_quantities(self.cart.id, {self.laptop.id: 2, self.mouse.id: 1})
+        self.assertEqual(self.quantities(), {"Laptop": 3, "Mouse": 1})
+
+    def test_fallback_without_upsert(self):
+        CartItem.objects.create(cart=self.cart, product=self.laptop, quantity=1)
+        with mock.patch("apps.cart.items.UPSERT_VENDORS", ()):
+            add_quantities(self.cart.id, {self.laptop.id: 2, self.mouse.id: 1})
+            add_quantities(self.cart.id, {self.mouse.id: 1})
+        self.assertEqual(self.quantities(), {"Laptop": 3, "Mouse": 2})
+
+    def test_unique_cart_product(self):
+        CartItem.objects.create(cart=self.cart, product=self.laptop)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CartItem.objects.create(cart=self.cart, product=self.laptop)
+
+    def test_invalid_quantity(self):
+        for quantity in (0, -1, "abc"):
+            with self.subTest(quantity=quantity):
+                response = self.client.post(
+                    "/api/v2/cart/add/",
+                    {
+                        "cart_code": self.cart.cart_code,
+                        "product_id": self.laptop.id,
+                        "quantity": quantity,
+                    },
+                    format="json",
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.quantities(), {})
+
+
+class ConcurrentCartAddTest(TransactionTestCase):
+    THREADS = 4
+    ADDS = 10
+
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("needs a database that threads can share")
+        self.cart = Cart.objects.create(cart_code="THREADS1234")
+        self.product = Product.objects.create(name="Laptop", description="", price=1)
+
+    def add_from_threads(self):
+        added = [0] * self.THREADS
+        start = threading.Barrier(self.THREADS)
+
+        def worker(index):
+            # No view transaction around it: the statement alone must not
+            # lose increments.
+            start.wait()
+            try:
+                for _ in range(self.ADDS):
+                    try:
+                        add_quantities(self.cart.id, {self.product.id: 1})
+                    except DatabaseError:
+                        # "database is locked" on SQLite: a failed add.
+                        continue
+                    added[index] += 1
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(index,))
+            for index in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(added)
+
+    def quantity(self):
+        return sum(self.cart.cartitems.values_list("quantity", flat=True))
+
+    def test_no_lost_increments(self):
+        added = self.add_from_threads()
+        self.assertGreater(added, 0)
+        self.assertEqual(self.quantity(), added)
+        self.assertEqual(self.cart.cartitems.count(), 1)
+
+    def test_no_lost_increments_without_upsert(self):
+        with mock.patch("apps.cart.items.UPSERT_VENDORS", ()):
+            added = self.add_from_threads()
+        self.assertGreater(added, 0)
+        self.assertEqual(self.quantity(), added)
+        self.assertEqual(self.cart.cartitems.count(), 1)
+
+
+class MergeCartsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="merger", email="merger@example.com", password="password123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.user_cart = Cart.objects.create(user=self.user, cart_code="USERCART123")
+        self.products = [
+            Product.objects.create(name=f"Product {i}", description="", price=1)
+            for i in range(30)
+        ]
+
+    def merge(self, code):
+        return self.client.post(
+            "/api/v2/cart/merge/", {"temp_cart_code": code}, format="json"
+        )
+
+    def test_quantities_are_summed(self):
+        CartItem.objects.create(
+            cart=self.user_cart, product=self.products[0], quantity=2
+        )
+        temp_cart = Cart.objects.create(cart_code="TEMPCART123")
+        CartItem.objects.create(cart=temp_cart, product=self.products[0], quantity=3)
+        CartItem.objects.create(cart=temp_cart, product=self.products[1], quantity=1)
+
+        response = self.merge("TEMPCART123")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            dict(self.user_cart.cartitems.values_list("product_id", "quantity")),
+            {self.products[0].id: 5, self.products[1].id: 1},
+        )
+        self.assertEqual(response.data["cart_total"], 6)
+        self.assertFalse(Cart.objects.filter(cart_code="TEMPCART123").exists())
+
+    def test_query_count_does_not_grow_with_items(self):
+        counts = []
+        for size in (1, 30):
+            temp_cart = Cart.objects.create(cart_code=f"TEMP{size:07d}")
+            CartItem.objects.bulk_create(
+                CartItem(cart=temp_cart, product=product, quantity=1)
+                for product in self.products[:size]
+            )
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(
+                    self.merge(temp_cart.cart_code).status_code, status.HTTP_200_OK
+                )
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(self.user_cart.cartitems.count(), 30)
+
+    def test_other_users_cart_is_not_merged(self):
+        other = User.objects.create_user(
+            username="other", email="other@example.com", password="password123"
+        )
+        other_cart = Cart.objects.create(user=other, cart_code="OTHERCART12")
+        CartItem.objects.create(cart=other_cart, product=self.products[0])
+
+        self.merge("OTHERCART12")
+
+        self.assertEqual(other_cart.cartitems.count(), 1)
+        self.assertEqual(self.user_cart.cartitems.count(), 0)
+
+    def test_merging_own_cart_keeps_it(self):
+        CartItem.objects.create(
+            cart=self.user_cart, product=self.products[0], quantity=2
+        )
+        response = self.merge("USERCART123")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user_cart.cartitems.get().quantity, 2)
+
+
+@override_settings(STATELESS_CARTS=True)
+class StatelessCartTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.laptop = Product.objects.create(name="Laptop", description="", price=100)
+        self.mouse = Product.objects.create(name="Mouse", description="", price=10)
+
+    def create(self):
+        with self.assertNumQueries(0):
+            response = self.client.post("/api/v2/cart/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["cart_code"]
+
+    def add(self, code, product, quantity=1):
+        return self.client.post(
+            "/api/v2/cart/add/",
+            {"cart_code": code, "product_id": product.id, "quantity": quantity},
+            format="json",
+        )
+
+    def test_anonymous_cart_writes_nothing(self):
+        code = self.create()
+        response = self.add(code, self.laptop, 2)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        code = response.data["cart_code"]
+        code = self.add(code, self.mouse).data["cart_code"]
+        code = self.add(code, self.laptop).data["cart_code"]
+
+        response = self.client.get("/api/v2/cart/", {"code": code})
+        self.assertEqual(
+            [
+                (item["product"]["name"], item["quantity"])
+                for item in response.data["cartitems"]
+            ],
+            [("Laptop", 3), ("Mouse", 1)],
+        )
+        self.assertEqual(response.data["cart_total"], 310)
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_batch(self):
+        code = self.add(self.create(), self.laptop, 2).data["cart_code"]
+        response = self.client.post(
+            "/api/v2/cart/batch/",
+            {
+                "cart_code": code,
+                "operations": [
+                    {"op": "remove", "product_id": self.laptop.id},
+                    {"op": "set", "product_id": self.mouse.id, "quantity": 4},
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(loads_cart(response.data["cart_code"]), {self.mouse.id: 4})
+        self.assertEqual(response.data["cart_total"], 40)
+
+    def test_merge_materializes_the_cart(self):
+        code = self.add(self.create(), self.laptop, 2).data["cart_code"]
+        code = self.add(code, self.mouse).data["cart_code"]
+        self.mouse.delete()
+        user = User.objects.create_user(
+            username="shopper", email="shopper@example.com", password="password123"
+        )
+        user_cart = Cart.objects.create(user=user, cart_code="SHOPPER1234")
+        CartItem.objects.create(cart=user_cart, product=self.laptop, quantity=1)
+        self.client.force_authenticate(user=user)
+
+        response = self.client.post(
+            "/api/v2/cart/merge/", {"temp_cart_code": code}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            dict(user_cart.cartitems.values_list("product_id", "quantity")),
+            {self.laptop.id: 3},
+        )
+
+    def test_merging_a_token_twice_adds_it_once(self):
+        code = self.add(self.create(), self.laptop, 2).data["cart_code"]
+        user = User.objects.create_user(
+            username="shopper", email="shopper@example.com", password="password123"
+        )
+        self.client.force_authenticate(user=user)
+
+        for _ in range(2):
+            response = self.client.post(
+                "/api/v2/cart/merge/", {"temp_cart_code": code}, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(
+            dict(CartItem.objects.values_list("product_id", "quantity")),
+            {self.laptop.id: 2},
+        )
+
+    def test_tampered_token(self):
+        code = self.add(self.create(), self.laptop).data["cart_code"]
+        response = self.client.get("/api/v2/cart/", {"code": code[:-1] + "x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("error", response.data)
+
+        user = User.objects.create_user(
+            username="shopper", email="shopper@example.com", password="password123"
+        )
+        self.client.force_authenticate(user=user)
+        response = self.client.post(
+            "/api/v2/cart/merge/", {"temp_cart_code": code[:-1] + "x"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("error", response.data)
+
+    def test_unknown_product(self):
+        response = self.client.post(
+            "/api/v2/cart/add/",
+            {"cart_code": self.create(), "product_id": 999999},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_database_carts_keep_working(self):
+        cart = Cart.objects.create(cart_code="DATABASE123")
+        response = self.add(cart.cart_code, self.laptop)
+        self.assertEqual(response.data["cart_code"], "DATABASE123")
+        self.assertEqual(cart.cartitems.get().quantity, 1)
+
+
+class PurgeCartsTest(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name="Laptop", description="", price=1)
+        self.user = User.objects.create_user(
+            username="keeper", email="keeper@example.com", password="password123"
+        )
+
+    def cart(self, code, idle, items=0, user=None):
+        cart = Cart.objects.create(cart_code=code, user=user)
+        if items:
+            CartItem.objects.create(cart=cart, product=self.product, quantity=items)
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now() - idle)
+        return cart
+
+    def purge(self, **options):
+        out = StringIO()
+        call_command("purge_carts", stdout=out, **options)
+        return out.getvalue()
+
+    def test_purge(self):
+        self.cart("OLDFULL", datetime.timedelta(days=40), items=2)
+        self.cart("OLDEMPTY", datetime.timedelta(hours=30))
+        self.cart("NEWEMPTY", datetime.timedelta(hours=2))
+        self.cart("RECENT", datetime.timedelta(days=3), items=1)
+        self.cart("USERCART", datetime.timedelta(days=400), items=1, user=self.user)
+
+        self.assertIn("2 carts would be deleted", self.purge(dry_run=True))
+        self.assertEqual(Cart.objects.count(), 5)
+
+        output = self.purge(batch_size=1, sleep=0)
+
+        self.assertIn("Deleted 2 carts and 1 items", output)
+        self.assertEqual(
+            set(Cart.objects.values_list("cart_code", flat=True)),
+            {"NEWEMPTY", "RECENT", "USERCART"},
+        )
+        self.assertEqual(CartItem.objects.count(), 2)
+
+    def test_adding_an_item_keeps_the_cart(self):
+        cart = self.cart("IDLE", datetime.timedelta(days=40))
+        APIClient().post(
+            "/api/v2/cart/add/",
+            {"cart_code": "IDLE", "product_id": self.product.id},
+            format="json",
+        )
+        self.purge()
+        self.assertTrue(Cart.objects.filter(pk=cart.pk).exists())
+
+    def test_add_while_purging_keeps_the_cart(self):
+        cart = self.cart("IDLE", datetime.timedelta(days=40))
+        delete_batch = PurgeCommand.delete_batch
+
+        def add_then_delete(command, abandoned, batch):
+            # add_to_cart commits after the purge read its batch and before
+            # it deletes it.
+            response = APIClient().post(
+                "/api/v2/cart/add/",
+                {"cart_code": "IDLE", "product_id": self.product.id},
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return delete_batch(command, abandoned, batch)
+
+        with mock.patch.object(PurgeCommand, "delete_batch", add_then_delete):
+            output = self.purge()
+
+        self.assertIn("Deleted 0 carts and 0 items", output)
+        self.assertEqual(CartItem.objects.get(cart=cart).quantity, 1)
+
+    def test_add_to_a_cart_purged_meanwhile(self):
+        cart = self.cart("IDLE", datetime.timedelta(days=40))
+
+        get = Cart.objects.get
+
+        def get_then_purge(**kwargs):
+            # purge_carts deletes the cart after the view looked it up.
+            found = get(**kwargs)
+            self.purge()
+            return found
+
+        with mock.patch.object(Cart.objects, "get", get_then_purge):
+            response = APIClient().post(
+                "/api/v2/cart/add/",
+                {"cart_code": "IDLE", "product_id": self.product.id},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Cart.objects.filter(pk=cart.pk).exists())
+        self.assertFalse(CartItem.objects.exists())
+
+
+class CartSummaryTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.cart = Cart.objects.create(cart_code="SUMMARY1234")
+        self.laptop = Product.objects.create(
+            name="Laptop", description="", price="999.99"
+        )
+        self.mouse = Product.objects.create(name="Mouse", description="", price=25)
+        CartItem.objects.create(cart=self.cart, product=self.laptop, quantity=2)
+        CartItem.objects.create(cart=self.cart, product=self.mouse, quantity=3)
+
+    def summary(self, **headers):
+        return self.client.get(
+            "/api/v2/cart/summary/", {"code": self.cart.cart_code}, **headers
+        )
+
+    def test_summary(self):
+        with self.assertNumQueries(1):
+            response = self.summary()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {
+                "id": self.cart.id,
+                "cart_code": "SUMMARY1234",
+                "item_count": 2,
+                "total_quantity": 5,
+                "cart_total": "2074.98",
+            },
+        )
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_empty_and_unknown_carts(self):
+        empty = Cart.objects.create(cart_code="EMPTY123456")
+        for code in (empty.cart_code, "UNKNOWN1234"):
+            with self.subTest(code=code):
+                response = self.client.get("/api/v2/cart/summary/", {"code": code})
+                self.assertEqual(response.data["item_count"], 0)
+                self.assertEqual(response.data["total_quantity"], 0)
+                self.assertEqual(response.data["cart_total"], "0.00")
+
+    def test_user_cart(self):
+        user = User.objects.create_user(
+            username="badge", email="badge@example.com", password="password123"
+        )
+        self.cart.user = user
+        self.cart.save()
+        self.client.force_authenticate(user=user)
+        response = self.client.get("/api/v2/cart/summary/")
+        self.assertEqual(response.data["total_quantity"], 5)
+
+    def test_etag_follows_the_cart(self):
+        etag = self.summary()["ETag"]
+        self.assertEqual(
+            self.summary(HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+
+        self.client.post(
+            "/api/v2/cart/add/",
+            {"cart_code": self.cart.cart_code, "product_id": self.mouse.id},
+            format="json",
+        )
+        response = self.summary(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total_quantity"], 6)
+
+        # A price change moves the total, and the ETag with it.
+        etag = response["ETag"]
+        self.mouse.price = 20
+        self.mouse.save()
+        response = self.summary(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["cart_total"], "2079.98")
+
+    @override_settings(STATELESS_CARTS=True)
+    def test_token_cart(self):
+        code = self.client.post("/api/v2/cart/").data["cart_code"]
+        code = self.client.post(
+            "/api/v2/cart/add/",
+            {"cart_code": code, "product_id": self.laptop.id, "quantity": 2},
+            format="json",
+        ).data["cart_code"]
+        response = self.client.get("/api/v2/cart/summary/", {"code": code})
+        self.assertEqual(response.data["item_count"], 1)
+        self.assertEqual(response.data["total_quantity"], 2)
+        self.assertEqual(response.data["cart_total"], "1999.98")
+
+    def test_no_cart(self):
+        response = self.client.get("/api/v2/cart/summary/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,127 @@
+"""
+Stateless anonymous carts.
+
+With ``settings.STATELESS_CARTS`` on, an anonymous ``POST /cart/`` writes
+nothing: the cart is a list of ``[product_id, quantity]`` pairs, signed and
+compressed with ``django.core.signing`` and handed to the client as the
+``cart_code``. Every change returns the cart with a new token, which the
+client keeps in place of the old one. The token only becomes a ``Cart`` row
+when ``merge_carts`` adds it to the user's cart at login, so browsing
+traffic never writes to the cart tables.
+
+Database cart codes are 11 alphanumeric characters; tokens always contain
+the ``:`` separators of the signature, which is how the views tell them
+apart (``is_cart_token``).
+
+Merging cannot delete a token the way it deletes a database cart, so
+``claim_cart_token`` remembers merged tokens in the cache until they expire:
+a login retry or a second tab merging the same token adds nothing.
+"""
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from apps.products.models import Product
+from .models import CartItem
+from .serializers import CartItemSerializer
+
+
+TOKEN_SALT = "apps.cart.tokens"
+# Keeps tokens small enough for a header or a cookie.
+MAX_TOKEN_ITEMS = 50
+
+
+class CartTokenFull(Exception):
+    pass
+
+
+def is_cart_token(code):
+    return isinstance(code, str) and ":" in code
+
+
+def dumps_cart(quantities):
+    """Sign ``quantities`` (``{product_id: units}``) into a token."""
+    if len(quantities) > MAX_TOKEN_ITEMS:
+        raise CartTokenFull
+    items = sorted(
+        [product_id, quantity] for product_id, quantity in quantities.items()
+    )
+    return signing.dumps(items, salt=TOKEN_SALT, compress=True)
+
+
+def loads_cart(token):
+    """
+    The ``{product_id: units}`` signed into ``token``. Raises
+    ``signing.BadSignature`` for tampered or expired tokens.
+    """
+    items = signing.loads(token, salt=TOKEN_SALT, max_age=settings.CART_TOKEN_MAX_AGE)
+    try:
+        return {int(product_id): int(quantity) for product_id, quantity in items}
+    except (TypeError, ValueError):
+        raise signing.BadSignature("Malformed cart token")
+
+
+def _merged_key(token):
+    return f"cart:token:merged:{token.rsplit(':', 1)[-1]}"
+
+
+def claim_cart_token(token):
+    """
+    Record ``token`` as merged. False when it already was, in which case its
+    items are in the user's cart and must not be added again.
+    """
+    return cache.add(_merged_key(token), True, settings.CART_TOKEN_MAX_AGE)
+
+
+def release_cart_token(token):
+    """Undo ``claim_cart_token`` when the merge did not go through."""
+    cache.delete(_merged_key(token))
+
+
+def token_cart_data(quantities):
+    """
+    ``CartSerializer`` output for a token cart, with the token of
+    ``quantities`` as ``cart_code``. The cart and its items have no ``id``;
+    products deleted since the token was issued are dropped.
+    """
+    products = Product.objects.defer("description").in_bulk(
+        [product_id for product_id, quantity in quantities.items() if quantity > 0]
+    )
+    items = [
+        CartItem(product=products[product_id], quantity=quantity)
+        for product_id, quantity in sorted(quantities.items())
+        if product_id in products
+    ]
+    return {
+        "id": None,
+        "cart_code": dumps_cart({item.product_id: item.quantity for item in items}),
+        "cartitems": CartItemSerializer(items, many=True).data,
+        "cart_total": sum([item.quantity * item.product.price for item in items]),
+    }
+
+
+def token_cart_summary(token, quantities):
+    """``CartStatSerializer`` data for a token cart, from one price query."""
+    prices = dict(
+        Product.objects.filter(
+            pk__in=[
+                product_id
+                for product_id, quantity in quantities.items()
+                if quantity > 0
+            ]
+        ).values_list("pk", "price")
+    )
+    items = {
+        product_id: quantity
+        for product_id, quantity in quantities.items()
+        if product_id in prices
+    }
+    return {
+        "id": None,
+        "cart_code": token,
+        "item_count": len(items),
+        "total_quantity": sum(items.values()),
+        "cart_total": sum(
+            [prices[product_id] * quantity for product_id, quantity in items.items()]
+        ),
+    }
@@ -5,7 +5,9 @@ from . import views
 urlpatterns = [
     # Cart
     path("", views.handle_cart, name="handle_cart"),
+    path("summary/", views.cart_summary, name="cart_summary"),
     path("add/", views.add_to_cart, name="add_to_cart"),
+    path("batch/", views.batch_cart, name="batch_cart"),
     path("merge/", views.merge_carts, name="merge_carts"),
     path("update/", views.update_cartitem_quantity, name="update_cartitem_quantity"),
     path("item/<int:pk>/delete/", views.delete_cartitem, name="delete_cartitem"),
@@ -2,9 +2,65 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.utils.cache import patch_cache_control
+from .fast import fast_cart
+from .items import (
+    add_quantities,
+    apply_operations,
+    fold_operations,
+    require_products,
+    touch_cart,
+)
 from .models import Cart, CartItem
-from .serializers import CartItemSerializer, CartSerializer
+from .serializers import (
+    CartBatchSerializer,
+    CartItemSerializer,
+    CartSerializer,
+    CartStatSerializer,
+    prefetch_cart_items,
+    with_cart_stats,
+)
+from .tokens import (
+    MAX_TOKEN_ITEMS,
+    CartTokenFull,
+    claim_cart_token,
+    is_cart_token,
+    loads_cart,
+    release_cart_token,
+    token_cart_data,
+    token_cart_summary,
+)
 from apps.products.models import Product
+from infostore.conditional import make_etag, not_modified, set_validators
+
+
+def cart_data(cart):
+    """Serialized ``cart``, on the fast path when ``FAST_SERIALIZERS`` is on."""
+    if settings.FAST_SERIALIZERS:
+        return fast_cart(cart)
+    prefetch_cart_items(cart)
+    return CartSerializer(cart).data
+
+
+def token_cart_response(quantities, status_code=status.HTTP_200_OK):
+    """The token cart of ``quantities``, see ``tokens.token_cart_data``."""
+    try:
+        return Response(token_cart_data(quantities), status=status_code)
+    except CartTokenFull:
+        return Response(
+            {"error": f"O carrinho pode ter no máximo {MAX_TOKEN_ITEMS} produtos."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+def invalid_cart_token():
+    return Response(
+        {"error": "Carrinho inválido ou expirado."},
+        status=status.HTTP_400_BAD_REQUEST,
+    )
 
 
 @api_view(["GET", "POST"])
@@ -26,6 +82,9 @@ def handle_cart(request):
                     random.choices(string.ascii_letters + string.digits, k=11)
                 )
                 cart.save()
+        elif settings.STATELESS_CARTS:
+            # Nothing is stored until the cart is merged at login.
+            return token_cart_response({}, status.HTTP_201_CREATED)
         else:
             import random
             import string
@@ -35,20 +94,24 @@ def handle_cart(request):
             )
             cart = Cart.objects.create(cart_code=cart_code)
 
-        serializer = CartSerializer(cart)
         return Response(
-            serializer.data,
+            cart_data(cart),
             status=status.HTTP_201_CREATED,
         )
 
     elif request.method == "GET":
         cart_code = request.query_params.get("code")
 
+        if is_cart_token(cart_code):
+            try:
+                return token_cart_response(loads_cart(cart_code))
+            except signing.BadSignature:
+                return invalid_cart_token()
+
         if cart_code:
             try:
                 cart = Cart.objects.get(cart_code=cart_code)
-                serializer = CartSerializer(cart)
-                return Response(serializer.data)
+                return Response(cart_data(cart))
             except Cart.DoesNotExist:
                 return Response({"cartitems": [], "cart_code": cart_code})
 
@@ -64,8 +127,7 @@ def handle_cart(request):
                         random.choices(string.ascii_letters + string.digits, k=11)
                     )
                     cart.save()
-                serializer = CartSerializer(cart)
-                return Response(serializer.data)
+                return Response(cart_data(cart))
             except Exception as e:
                 return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -77,6 +139,55 @@ def handle_cart(request):
         )
 
 
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def cart_summary(request):
+    """
+    Item count, total quantity and total amount of a cart, for the header
+    badge: one aggregate query and no item serialization. Same lookup as
+    ``handle_cart`` GET (``?code=`` or the authenticated user's cart).
+
+    The ETag is built from the summary itself, so it changes with the cart
+    version and with the prices behind the total; polling clients get a
+    ``304`` until either moves.
+    """
+    cart_code = request.query_params.get("code")
+
+    if is_cart_token(cart_code):
+        try:
+            summary = token_cart_summary(cart_code, loads_cart(cart_code))
+        except signing.BadSignature:
+            return invalid_cart_token()
+    elif cart_code:
+        summary = with_cart_stats(Cart.objects.filter(cart_code=cart_code)).first()
+    elif request.user.is_authenticated:
+        summary = with_cart_stats(Cart.objects.filter(user=request.user)).first()
+    else:
+        return Response(
+            {
+                "error": "É necessário estar autenticado ou fornecer um código de carrinho."
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if summary is None:
+        # Like handle_cart, an unknown cart reads as an empty one.
+        summary = {
+            "id": None,
+            "cart_code": cart_code,
+            "item_count": 0,
+            "total_quantity": 0,
+            "cart_total": 0,
+        }
+    data = CartStatSerializer(summary).data
+
+    etag = make_etag(request, *data.values())
+    response = not_modified(request, etag) or Response(data)
+    # Carts are per visitor: never kept by shared caches.
+    patch_cache_control(response, private=True)
+    return set_validators(response, etag)
+
+
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def add_to_cart(request):
@@ -84,25 +195,108 @@ def add_to_cart(request):
     product_id = request.data.get("product_id")
     quantity = request.data.get("quantity", 1)
 
+    try:
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        return Response(
+            {"error": "Quantidade inválida."}, status=status.HTTP_400_BAD_REQUEST
+        )
+    if quantity <= 0:
+        return Response(
+            {"error": "A quantidade deve ser maior que zero."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if is_cart_token(cart_code):
+        try:
+            quantities = loads_cart(cart_code)
+            require_products([product_id])
+        except signing.BadSignature:
+            return invalid_cart_token()
+        except (Product.DoesNotExist, TypeError, ValueError):
+            return Response(
+                {"error": "Produto não encontrado."}, status=status.HTTP_404_NOT_FOUND
+            )
+        product_id = int(product_id)
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+        return token_cart_response(quantities)
+
     try:
         # Buscar ou criar o carrinho
         cart = Cart.objects.get(cart_code=cart_code)
-        product = Product.objects.get(id=product_id)
+        product = Product.objects.only("id").get(id=product_id)
 
-        # Buscar ou criar o item do carrinho
-        cartitem, created = CartItem.objects.get_or_create(
-            product=product, cart=cart, defaults={"quantity": 0}
+        with transaction.atomic():
+            if not touch_cart(cart.id):
+                raise Cart.DoesNotExist
+            # Criar o item ou somar à quantidade, numa única instrução
+            add_quantities(cart.id, {product.id: quantity})
+
+        return Response(cart_data(cart), status=status.HTTP_200_OK)
+    except Cart.DoesNotExist:
+        return Response(
+            {"error": "Carrinho não encontrado."}, status=status.HTTP_404_NOT_FOUND
+        )
+    except Product.DoesNotExist:
+        return Response(
+            {"error": "Produto não encontrado."}, status=status.HTTP_404_NOT_FOUND
         )
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        if created:
-            cartitem.quantity = quantity
-        else:
-            cartitem.quantity += quantity
 
-        cartitem.save()
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def batch_cart(request):
+    """
+    Apply a list of ``add`` / ``set`` / ``remove`` operations to a cart in
+    one transaction and return the resulting cart.
+
+    See ``items.apply_operations``: the number of queries does not depend
+    on the number of operations.
+    """
+    serializer = CartBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    operations = serializer.validated_data["operations"]
+    cart_code = serializer.validated_data["cart_code"]
+
+    if is_cart_token(cart_code):
+        try:
+            current = loads_cart(cart_code)
+        except signing.BadSignature:
+            return invalid_cart_token()
+        quantities = fold_operations(current, operations)
+        try:
+            require_products(
+                product_id
+                for product_id, quantity in quantities.items()
+                if quantity and product_id not in current
+            )
+        except Product.DoesNotExist:
+            return Response(
+                {"error": "Produto não encontrado."}, status=status.HTTP_404_NOT_FOUND
+            )
+        # Removed products (0 units) are left out of the new token.
+        return token_cart_response(quantities)
+
+    try:
+        cart = Cart.objects.get(cart_code=cart_code)
+    except Cart.DoesNotExist:
+        return Response(
+            {"error": "Carrinho não encontrado."}, status=status.HTTP_404_NOT_FOUND
+        )
+    if cart.user_id and cart.user_id != request.user.pk:
+        return Response(
+            {"error": "Você não tem permissão para modificar este carrinho."},
+            status=status.HTTP_403_FORBIDDEN,
+        )
 
-        serializer = CartSerializer(cart)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+    try:
+        with transaction.atomic():
+            if not touch_cart(cart.id):
+                raise Cart.DoesNotExist
+            apply_operations(cart, operations)
     except Cart.DoesNotExist:
         return Response(
             {"error": "Carrinho não encontrado."}, status=status.HTTP_404_NOT_FOUND
@@ -111,8 +305,14 @@ def add_to_cart(request):
         return Response(
             {"error": "Produto não encontrado."}, status=status.HTTP_404_NOT_FOUND
         )
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except IntegrityError:
+        # A concurrent request added one of the new products first.
+        return Response(
+            {"error": "O carrinho foi alterado por outro pedido; tente novamente."},
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    return Response(cart_data(cart))
 
 
 @api_view(["PUT"])
@@ -129,7 +329,9 @@ def update_cartitem_quantity(request):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        cartitem = CartItem.objects.get(id=cartitem_id)
+        cartitem = CartItem.objects.select_related("cart", "product").get(
+            id=cartitem_id
+        )
 
         if cartitem.cart.user and cartitem.cart.user != request.user:
             return Response(
@@ -138,7 +340,9 @@ def update_cartitem_quantity(request):
             )
 
         cartitem.quantity = quantity
-        cartitem.save()
+        with transaction.atomic():
+            touch_cart(cartitem.cart_id)
+            cartitem.save()
 
         serializer = CartItemSerializer(cartitem)
         return Response(
@@ -172,7 +376,9 @@ def delete_cartitem(request, pk):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        cartitem.delete()
+        with transaction.atomic():
+            touch_cart(cartitem.cart_id)
+            cartitem.delete()
         return Response(
             {"message": "Item do carrinho excluído com sucesso"},
             status=status.HTTP_204_NO_CONTENT,
@@ -202,23 +408,45 @@ def merge_carts(request):
             )
             user_cart.save()
 
-        # Get the temporary cart (if exist)
+        # Get the temporary cart (if exist): only anonymous carts are merged
         temp_cart_code = request.data.get("temp_cart_code")
-        if temp_cart_code:
+        if is_cart_token(temp_cart_code):
+            # A stateless cart becomes rows here, skipping deleted products.
             try:
-                temp_cart = Cart.objects.get(cart_code=temp_cart_code)
-                # Move items from temporary cart to user cart
-                for item in temp_cart.cartitems.all():
-                    CartItem.objects.update_or_create(
-                        cart=user_cart,
-                        product=item.product,
-                        defaults={"quantity": item.quantity},
-                    )
-                temp_cart.delete()
-            except Cart.DoesNotExist:
-                pass
-
-        serializer = CartSerializer(user_cart)
-        return Response(serializer.data)
+                quantities = loads_cart(temp_cart_code)
+            except signing.BadSignature:
+                return invalid_cart_token()
+            if not claim_cart_token(temp_cart_code):
+                # Already merged: adding it again would double every quantity.
+                quantities = {}
+            existing = Product.objects.filter(pk__in=list(quantities))
+            quantities = {
+                product_id: quantities[product_id]
+                for product_id in existing.values_list("pk", flat=True)
+                if quantities[product_id] > 0
+            }
+            try:
+                with transaction.atomic():
+                    if quantities:
+                        touch_cart(user_cart.id)
+                    add_quantities(user_cart.id, quantities)
+            except Exception:
+                release_cart_token(temp_cart_code)
+                raise
+        elif temp_cart_code and temp_cart_code != user_cart.cart_code:
+            temp_carts = Cart.objects.filter(
+                cart_code=temp_cart_code, user__isnull=True
+            )
+            with transaction.atomic():
+                # Move items from temporary cart to user cart, adding to the
+                # quantities already there: one read and one upsert in all
+                items = CartItem.objects.filter(cart__in=temp_carts)
+                quantities = dict(items.values_list("product_id", "quantity"))
+                if quantities:
+                    touch_cart(user_cart.id)
+                add_quantities(user_cart.id, quantities)
+                temp_carts.delete()
+
+        return Response(cart_data(user_cart))
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
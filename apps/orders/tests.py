@@ -315,3 +315,75 @@ class OrdersAPITest(TestCase):
         response = self.client.get(f"/api/v2/order/{order.id}/")
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+
+
+class OrderStockTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="buyer", email="buyer@example.com", password="password123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.laptop = Product.objects.create(
+            name="Laptop", description="Laptop", price=100, stock=3
+        )
+        self.mouse = Product.objects.create(
+            name="Mouse", description="Mouse", price=10, stock=1
+        )
+        self.cable = Product.objects.create(
+            name="Cable", description="Cable", price=1
+        )
+        self.cart = Cart.objects.create(user=self.user, cart_code="STOCK1")
+
+    def checkout(self):
+        return self.client.post(
+            "/api/v2/order/create/",
+            {
+                "payment_method": "dinheiro",
+                "shipping_address": {"city": "Luanda"},
+                "notes": "",
+            },
+            format="json",
+        )
+
+    def test_stock_is_taken(self):
+        CartItem.objects.create(cart=self.cart, product=self.laptop, quantity=2)
+        CartItem.objects.create(cart=self.cart, product=self.cable, quantity=5)
+        self.client.get(f"/api/v2/product/{self.laptop.slug}/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.checkout()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.laptop.refresh_from_db()
+        self.cable.refresh_from_db()
+        self.assertEqual(self.laptop.stock, 1)
+        # Untracked products stay untracked.
+        self.assertIsNone(self.cable.stock)
+        response = self.client.get(f"/api/v2/product/{self.laptop.slug}/")
+        self.assertEqual(response.data["stock"], 1)
+
+    def test_insufficient_stock(self):
+        CartItem.objects.create(cart=self.cart, product=self.laptop, quantity=1)
+        CartItem.objects.create(cart=self.cart, product=self.mouse, quantity=2)
+
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["error"], "Estoque insuficiente: Mouse.")
+        # Nothing is taken, no order is created and the cart is kept.
+        self.laptop.refresh_from_db()
+        self.mouse.refresh_from_db()
+        self.assertEqual((self.laptop.stock, self.mouse.stock), (3, 1))
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.cart.cartitems.count(), 2)
+
+    def test_last_unit(self):
+        CartItem.objects.create(cart=self.cart, product=self.mouse, quantity=1)
+        self.assertEqual(self.checkout().status_code, status.HTTP_201_CREATED)
+
+        CartItem.objects.create(cart=self.cart, product=self.mouse, quantity=1)
+        self.assertEqual(self.checkout().status_code, status.HTTP_409_CONFLICT)
+        self.mouse.refresh_from_db()
+        self.assertEqual(self.mouse.stock, 0)
+        self.assertEqual(Order.objects.count(), 1)
@@ -2,9 +2,26 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from collections import Counter
+from django.db import transaction
+from django.db.models import Prefetch
 from .models import Order, OrderItem
 from .serializers import CreateOrderSerializer, OrderSerializer
 from apps.cart.models import Cart
+from apps.products.stock import InsufficientStock, reserve_stock
+
+
+def with_items(queryset):
+    # The nested products only show their excerpt, so the description
+    # column is left out of the items query.
+    return queryset.prefetch_related(
+        Prefetch(
+            "items",
+            queryset=OrderItem.objects.select_related("product").defer(
+                "product__description"
+            ),
+        )
+    )
 
 
 @api_view(["POST"])
@@ -16,38 +33,63 @@ def create_order(request):
             # Get user cart
             try:
                 cart = Cart.objects.get(user=request.user)
-                if not cart.cartitems.exists():
-                    return Response(
-                        {"error": "Seu carrinho está vazio."},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
             except Cart.DoesNotExist:
                 return Response(
                     {"error": "Carrinho não encontrado."},
                     status=status.HTTP_404_NOT_FOUND,
                 )
+            items = list(cart.cartitems.select_related("product"))
+            if not items:
+                return Response(
+                    {"error": "Seu carrinho está vazio."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
 
-            total = sum(
-                item.product.price * item.quantity for item in cart.cartitems.all()
-            )
-
-            order = Order.objects.create(
-                user=request.user,
-                payment_method=serializer.validated_data["payment_method"],
-                total_amount=total,
-                shipping_address=serializer.validated_data["shipping_address"],
-                notes=serializer.validated_data["notes"],
-            )
+            total = sum(item.product.price * item.quantity for item in items)
+            quantities = Counter()
+            for item in items:
+                if item.product.stock is not None:
+                    quantities[item.product_id] += item.quantity
+            slugs = {
+                item.product.slug for item in items if item.product_id in quantities
+            }
 
-            for item in cart.cartitems.all():
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    quantity=item.quantity,
-                    price=item.product.price,
+            try:
+                with transaction.atomic():
+                    order = Order.objects.create(
+                        user=request.user,
+                        payment_method=serializer.validated_data["payment_method"],
+                        total_amount=total,
+                        shipping_address=serializer.validated_data["shipping_address"],
+                        notes=serializer.validated_data["notes"],
+                    )
+                    OrderItem.objects.bulk_create(
+                        OrderItem(
+                            order=order,
+                            product=item.product,
+                            quantity=item.quantity,
+                            price=item.product.price,
+                        )
+                        for item in items
+                    )
+                    # Only the items that were ordered, should the cart
+                    # have changed meanwhile.
+                    cart.cartitems.filter(pk__in=[item.pk for item in items]).delete()
+                    # Last, so the product rows stay locked for as short as
+                    # possible.
+                    reserve_stock(quantities, slugs)
+            except InsufficientStock as e:
+                names = sorted(
+                    {
+                        item.product.name
+                        for item in items
+                        if item.product_id in e.product_ids
+                    }
+                )
+                return Response(
+                    {"error": f"Estoque insuficiente: {', '.join(names)}."},
+                    status=status.HTTP_409_CONFLICT,
                 )
-
-            cart.cartitems.all().delete()
 
             return Response(
                 {"id": order.id, "message": "Pedido criado com sucesso."},
@@ -62,7 +104,9 @@ def create_order(request):
 @permission_classes([IsAuthenticated])
 def get_user_orders(request):
     try:
-        orders = Order.objects.filter(user=request.user).order_by("-created_at")
+        orders = with_items(Order.objects.filter(user=request.user)).order_by(
+            "-created_at"
+        )
         serializer = OrderSerializer(orders, many=True)
         return Response(serializer.data)
     except Exception as e:
@@ -73,7 +117,7 @@ def get_user_orders(request):
 @permission_classes([IsAuthenticated])
 def get_order_detail(request, pk):
     try:
-        order = Order.objects.get(pk=pk, user=request.user)
+        order = with_items(Order.objects).get(pk=pk, user=request.user)
         serializer = OrderSerializer(order)
         return Response(serializer.data)
     except Order.DoesNotExist:
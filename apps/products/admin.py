@@ -3,7 +3,7 @@ from .models import Product, Category
 
 
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ["name", "price", "featured"]
+    list_display = ["name", "price", "stock", "featured"]
 
 
 admin.site.register(Product, ProductAdmin)
@@ -0,0 +1,119 @@
+import uuid
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from .models import CatalogVersion, Product
+from .serializers import ProductDetailSerializer
+
+
+# Bump whenever ProductDetailSerializer output or the cached entry shape
+# changes so workers never serve entries cached in the old shape.
+PRODUCT_DETAIL_CACHE_VERSION = 5
+
+
+def cache_is_shared():
+    """
+    Whether every process sees the same default cache (Redis), so that a
+    delete or a version bump in one of them, e.g. a management command,
+    reaches the web workers.
+    """
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def product_detail_key(slug):
+    return f"product:detail:v{PRODUCT_DETAIL_CACHE_VERSION}:{slug}"
+
+
+def _detail_stamp(slug):
+    # What a cached detail depends on; every write to it moves one of these.
+    stamp = (
+        Product.objects.filter(slug=slug)
+        .values_list("updated_at", "category_id", "category__updated_at")
+        .first()
+    )
+    if stamp is None:
+        raise Product.DoesNotExist(f"No product with slug {slug!r}.")
+    return stamp
+
+
+def get_product_detail(slug):
+    """
+    Return ``(data, last_modified)`` for ``slug``, reading through the cache.
+    ``last_modified`` is the newest ``updated_at`` of the product and its
+    category. Raises ``Product.DoesNotExist`` for unknown slugs.
+
+    With a per-process cache, invalidations made by other processes never
+    arrive, so a hit is first checked against the row's ``updated_at``
+    stamps: one indexed lookup instead of the full load and serialization.
+    """
+    key = product_detail_key(slug)
+    entry = cache.get(key)
+    if entry is not None and not cache_is_shared():
+        if entry[2] != _detail_stamp(slug):
+            entry = None
+    if entry is None:
+        product = Product.objects.select_related("category").get(slug=slug)
+        category = product.category
+        last_modified = product.updated_at
+        if category and category.updated_at > last_modified:
+            last_modified = category.updated_at
+        stamp = (
+            product.updated_at,
+            product.category_id,
+            category.updated_at if category else None,
+        )
+        entry = (dict(ProductDetailSerializer(product).data), last_modified, stamp)
+        cache.set(key, entry, settings.PRODUCT_DETAIL_CACHE_TIMEOUT)
+    return entry[:2]
+
+
+def invalidate_product_detail(*slugs):
+    cache.delete_many([product_detail_key(slug) for slug in slugs if slug])
+
+
+CATALOG_VERSION_KEY = "product:catalog:version"
+# The popularity/trending scores only change the order of score sorts, so
+# compute_product_scores moves this one and leaves the catalog version alone.
+SCORES_VERSION_KEY = "product:scores:version"
+
+
+def catalog_version(key=CATALOG_VERSION_KEY):
+    """
+    Opaque version of the product catalog (products and categories) for list
+    ETags, instead of an aggregate over the tables.
+
+    With a shared cache it is one cache read; a missing key starts a new
+    random version, so ETags issued before an eviction or a cache flush never
+    match again. A per-process cache would keep each worker on its own
+    version, so the version is then a ``CatalogVersion`` row read by primary
+    key.
+    """
+    if cache_is_shared():
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            version = cache.get(key)
+        return version
+    version = (
+        CatalogVersion.objects.filter(key=key).values_list("version", flat=True).first()
+    )
+    if version is None:
+        version = CatalogVersion.objects.get_or_create(
+            key=key, defaults={"version": uuid.uuid4().hex}
+        )[0].version
+    return version
+
+
+def bump_catalog_version(key=CATALOG_VERSION_KEY):
+    """
+    Move the catalog version after products or categories change. Signals
+    call it on commit; bulk writes that send no signals (``QuerySet.update``,
+    ``bulk_create``) must call it themselves.
+    """
+    if cache_is_shared():
+        cache.set(key, uuid.uuid4().hex, None)
+    else:
+        CatalogVersion.objects.update_or_create(
+            key=key, defaults={"version": uuid.uuid4().hex}
+        )
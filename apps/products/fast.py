@@ -0,0 +1,61 @@
+"""
+Fast-path serialization for the hot product list endpoints.
+
+``FastProductList`` builds the same dicts as ``ProductListSerializer`` from
+``.values()`` rows: the columns and per-field converters are worked out once
+per request instead of walking DRF fields for every row. Output must stay
+byte-identical to the serializer (``FastSerializerTest`` checks it), so any
+change to ``ProductListSerializer`` needs the matching change here.
+
+Used by the views when ``settings.FAST_SERIALIZERS`` is on.
+"""
+
+from functools import lru_cache
+from .images import media_url_builder, srcset
+from .models import Product
+from .serializers import ProductListSerializer
+
+
+@lru_cache(maxsize=None)
+def _price_to_representation():
+    # Same quantizing and string coercion as the DRF DecimalField.
+    return ProductListSerializer().fields["price"].to_representation
+
+
+class FastProductList:
+    """
+    Serialize product ``.values()`` rows like ``ProductListSerializer``.
+
+    ``prefix`` reads the product through a relation, e.g. ``"product__"``
+    for cart item rows.
+    """
+
+    def __init__(self, fields=None, omit=None, prefix=""):
+        url = media_url_builder(Product._meta.get_field("image").storage)
+        converters = {
+            # FileField.to_representation without a request in the context.
+            "image": lambda name: url(name) if name else None,
+            "image_srcset": lambda variants: srcset(variants, url=url),
+            "price": _price_to_representation(),
+        }
+        self.getters = []
+        self.columns = [f"{prefix}id"]
+        for name in ProductListSerializer.selected_fields(fields, omit):
+            (column,) = ProductListSerializer.source_columns.get(name, [name])
+            column = f"{prefix}{column}"
+            if column not in self.columns:
+                self.columns.append(column)
+            self.getters.append((name, column, converters.get(name)))
+
+    def values(self, queryset, *extra):
+        """``queryset.values()`` with the output columns plus ``extra`` ones."""
+        return queryset.values(*self.columns, *extra)
+
+    def row(self, row):
+        return {
+            name: row[column] if convert is None else convert(row[column])
+            for name, column, convert in self.getters
+        }
+
+    def rows(self, rows):
+        return [self.row(row) for row in rows]
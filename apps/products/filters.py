@@ -0,0 +1,106 @@
+from decimal import Decimal
+from django.db.models import Count, Q
+from django_filters import rest_framework as filters
+from .models import Product
+
+
+# Upper bounds (exclusive) of the price facet buckets; the last bucket is
+# open-ended.
+PRICE_BUCKETS = [Decimal("50"), Decimal("100"), Decimal("500"), Decimal("1000")]
+
+# "N stars & up" rating facet buckets.
+RATING_BUCKETS = [4, 3, 2, 1]
+
+
+class CharInFilter(filters.BaseInFilter, filters.CharFilter):
+    pass
+
+
+class ProductFilter(filters.FilterSet):
+    category = CharInFilter(field_name="category__slug", lookup_expr="in")
+    min_price = filters.NumberFilter(field_name="price", lookup_expr="gte")
+    max_price = filters.NumberFilter(field_name="price", lookup_expr="lte")
+    min_rating = filters.NumberFilter(field_name="average_rating", lookup_expr="gte")
+    featured = filters.BooleanFilter()
+
+    class Meta:
+        model = Product
+        fields = ["category", "min_price", "max_price", "min_rating", "featured"]
+
+
+# Filter params that select within a facet. A facet is counted with its own
+# params left out, so picking one category still shows the other categories.
+FACET_PARAMS = {
+    "categories": ["category"],
+    "price": ["min_price", "max_price"],
+    "rating": ["min_rating"],
+}
+
+
+def _facet_queryset(filterset, facet):
+    data = filterset.data.copy()
+    for param in FACET_PARAMS[facet]:
+        data.pop(param, None)
+    return ProductFilter(data, queryset=filterset.queryset).qs.order_by()
+
+
+def _category_facet(queryset):
+    rows = (
+        queryset.filter(category__isnull=False)
+        .values("category__slug", "category__name")
+        .annotate(count=Count("id"))
+        .order_by("-count", "category__name")
+    )
+    return [
+        {
+            "slug": row["category__slug"],
+            "name": row["category__name"],
+            "count": row["count"],
+        }
+        for row in rows
+    ]
+
+
+def _price_facet(queryset):
+    bounds = [None] + PRICE_BUCKETS + [None]
+    ranges = list(zip(bounds, bounds[1:]))
+
+    counts = {}
+    for index, (low, high) in enumerate(ranges):
+        condition = Q()
+        if low is not None:
+            condition &= Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        counts[f"bucket_{index}"] = Count("id", filter=condition)
+    totals = queryset.aggregate(**counts)
+
+    return [
+        {"min": low, "max": high, "count": totals[f"bucket_{index}"]}
+        for index, (low, high) in enumerate(ranges)
+    ]
+
+
+def _rating_facet(queryset):
+    totals = queryset.aggregate(
+        **{
+            f"rating_{rating}": Count("id", filter=Q(average_rating__gte=rating))
+            for rating in RATING_BUCKETS
+        }
+    )
+    return [
+        {"min": rating, "count": totals[f"rating_{rating}"]}
+        for rating in RATING_BUCKETS
+    ]
+
+
+def facet_counts(filterset):
+    """
+    Facet counts for a bound ``ProductFilter``, one grouped or conditional
+    aggregate query per facet.
+    """
+    return {
+        "categories": _category_facet(_facet_queryset(filterset, "categories")),
+        "price": _price_facet(_facet_queryset(filterset, "price")),
+        "rating": _rating_facet(_facet_queryset(filterset, "rating")),
+    }
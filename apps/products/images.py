@@ -0,0 +1,131 @@
+"""
+Responsive image derivatives for product and category images.
+
+Each upload gets downscaled copies in WebP and JPEG, stored next to the
+original as ``<name>_<width>w.<ext>``. The generated names are recorded on the
+model's ``image_variants`` field, so serializers can build ``srcset`` strings
+without touching storage.
+"""
+
+import os
+from functools import lru_cache, partial
+from io import BytesIO
+from urllib.parse import urljoin
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+from PIL import Image, ImageOps
+
+
+# Widths (px) of the derivatives; each fits in a width x width box.
+THUMBNAIL_WIDTHS = [200, 400, 800]
+
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def derivative_name(name, width, extension):
+    root, _ = os.path.splitext(name)
+    return f"{root}_{width}w.{extension}"
+
+
+def generate_derivatives(name, storage=default_storage):
+    """
+    Write the derivatives of the stored image ``name`` and return the
+    ``{format: {width: name}}`` map to keep in ``image_variants``.
+    """
+    with storage.open(name, "rb") as handle:
+        original = ImageOps.exif_transpose(Image.open(handle))
+        original.load()
+
+    widths = [width for width in THUMBNAIL_WIDTHS if width < original.width]
+    widths = widths or THUMBNAIL_WIDTHS[:1]
+
+    variants = {extension: {} for extension in FORMATS}
+    for width in widths:
+        thumbnail = original.copy()
+        thumbnail.thumbnail((width, width), Image.LANCZOS)
+        if thumbnail.mode not in ("RGB", "L"):
+            thumbnail = thumbnail.convert("RGB")
+
+        for extension, (image_format, options) in FORMATS.items():
+            buffer = BytesIO()
+            thumbnail.save(buffer, image_format, **options)
+            target = derivative_name(name, width, extension)
+            if storage.exists(target):
+                storage.delete(target)
+            variants[extension][str(width)] = storage.save(
+                target, ContentFile(buffer.getvalue())
+            )
+    return variants
+
+
+@lru_cache(maxsize=8192)
+def _filesystem_url(base_url, name):
+    # FileSystemStorage.url() without the per-call urljoin parsing cost.
+    return urljoin(base_url, filepath_to_uri(name).lstrip("/"))
+
+
+def media_url_builder(storage=default_storage):
+    """
+    Return a ``name -> storage.url(name)`` function, memoized for
+    ``FileSystemStorage`` where the URL only depends on ``base_url`` and the
+    name. Other storages (signed S3 URLs, ...) are always asked.
+    """
+    if isinstance(storage, FileSystemStorage):
+        return partial(_filesystem_url, storage.base_url)
+    return storage.url
+
+
+def srcset(variants, storage=default_storage, url=None):
+    """
+    ``{format: "url 200w, url 400w"}`` from an ``image_variants`` map. ``url``
+    is a ``media_url_builder`` result to reuse across calls.
+    """
+    url = url or media_url_builder(storage)
+    return {
+        extension: ", ".join(
+            f"{url(name)} {width}w"
+            for width, name in sorted(names.items(), key=lambda item: int(item[0]))
+        )
+        for extension, names in (variants or {}).items()
+        if names
+    }
+
+
+def image_changed(instance, update_fields=None):
+    """
+    Whether ``instance.image`` differs from the value it was loaded with. A
+    save that leaves ``image`` out (deferred, or not in ``update_fields``)
+    did not write it, so it did not change it either.
+    """
+    if update_fields is not None and "image" not in update_fields:
+        return False
+    if "image" in instance.get_deferred_fields():
+        return False
+    current = instance.image.name if instance.image else None
+    return current != (getattr(instance, "_loaded_image", None) or None)
+
+
+def refresh_derivatives(instance):
+    """
+    Regenerate the derivatives of ``instance.image`` after an upload (or drop
+    them when the image was cleared) and store the new map without sending
+    save signals again.
+    """
+    variants = generate_derivatives(instance.image.name) if instance.image else {}
+
+    kept = {name for names in variants.values() for name in names.values()}
+    for names in (instance.image_variants or {}).values():
+        for name in names.values():
+            if name not in kept:
+                default_storage.delete(name)
+
+    instance.image_variants = variants
+    instance._loaded_image = instance.image.name if instance.image else None
+    type(instance).objects.filter(pk=instance.pk).update(
+        image_variants=variants, updated_at=timezone.now()
+    )
@@ -0,0 +1,134 @@
+import time
+from decimal import Decimal
+from importlib.util import find_spec
+from io import BytesIO
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from apps.cart.fast import FastCartItems
+from apps.cart.models import CartItem
+from apps.cart.serializers import CartItemSerializer
+from apps.products.fast import FastProductList
+from apps.products.models import Product
+from apps.products.serializers import ProductListSerializer
+
+# orjson is optional, as in settings.py; without it only the serializers run.
+if find_spec("orjson"):
+    from infostore.parsers import ORJSONParser
+    from infostore.renderers import ORJSONRenderer
+
+
+def sample_product(pk):
+    variants = {
+        ext: {str(w): f"product_img/p{pk}_{w}w.{ext}" for w in (200, 400, 800)}
+        for ext in ("webp", "jpeg")
+    }
+    return Product(
+        id=pk,
+        name=f"Product {pk}",
+        slug=f"product-{pk}",
+        excerpt="A short plain-text excerpt of the product description. " * 2,
+        image=f"product_img/p{pk}.jpg",
+        image_variants=variants,
+        price=Decimal("1299.99"),
+        average_rating=4.5,
+        total_reviews=128,
+    )
+
+
+def as_values(product, prefix=""):
+    # Raw attribute values, as .values() returns them (image as its name).
+    return {
+        f"{prefix}{field.attname}": product.__dict__[field.attname]
+        for field in Product._meta.concrete_fields
+    }
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark the per-row cost of the DRF serializers against the "
+        "fast path, and of the stdlib JSON renderer/parser against orjson, on "
+        "in-memory rows (no database access)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        products = [sample_product(pk) for pk in range(1, rows + 1)]
+        product_rows = [as_values(product) for product in products]
+        items = [
+            CartItem(id=product.id, product=product, quantity=2) for product in products
+        ]
+        item_rows = [
+            {
+                "id": item.id,
+                "quantity": item.quantity,
+                **as_values(item.product, "product__"),
+            }
+            for item in items
+        ]
+
+        fast_products = FastProductList()
+        fast_items = FastCartItems()
+        page = {
+            "count": rows,
+            "next": None,
+            "previous": None,
+            "results": ProductListSerializer(products, many=True).data,
+        }
+        cart = {"cartitems": CartItemSerializer(items, many=True).data}
+        body = JSONRenderer().render(page)
+
+        cases = [
+            (
+                "products",
+                ("DRF", lambda: ProductListSerializer(products, many=True).data),
+                ("fast", lambda: fast_products.rows(product_rows)),
+            ),
+            (
+                "cart items",
+                ("DRF", lambda: CartItemSerializer(items, many=True).data),
+                ("fast", lambda: fast_items.rows(item_rows)),
+            ),
+        ]
+        if find_spec("orjson"):
+            cases += [
+                (
+                    "render products",
+                    ("json", lambda: JSONRenderer().render(page)),
+                    ("orjson", lambda: ORJSONRenderer().render(page)),
+                ),
+                (
+                    "render cart",
+                    ("json", lambda: JSONRenderer().render(cart)),
+                    ("orjson", lambda: ORJSONRenderer().render(cart)),
+                ),
+                (
+                    "parse products",
+                    ("json", lambda: JSONParser().parse(BytesIO(body))),
+                    ("orjson", lambda: ORJSONParser().parse(BytesIO(body))),
+                ),
+            ]
+        else:
+            self.stderr.write("orjson is not installed; skipping its cases.")
+
+        for label, (before_name, before), (after_name, after) in cases:
+            before_cost = best_of(repeat, before) / rows * 1e6
+            after_cost = best_of(repeat, after) / rows * 1e6
+            self.stdout.write(
+                f"{label:<16} {before_name:>6} {before_cost:7.2f} µs/row   "
+                f"{after_name:>6} {after_cost:7.2f} µs/row   "
+                f"({before_cost / after_cost:.1f}x)"
+            )
@@ -0,0 +1,123 @@
+import threading
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from apps.products.models import Product
+from apps.products.stock import InsufficientStock, reserve_stock
+
+
+def locked_checkout(product_id, work):
+    """The ``select_for_update`` pattern, for comparison: lock, work, write."""
+    product = Product.objects.select_for_update().only("stock").get(pk=product_id)
+    if product.stock < 1:
+        raise InsufficientStock([product_id])
+    work()
+    Product.objects.filter(pk=product_id).update(stock=product.stock - 1)
+
+
+def conditional_checkout(product_id, work):
+    """What ``create_order`` does: work first, conditional decrement last."""
+    work()
+    reserve_stock({product_id: 1})
+
+
+STRATEGIES = {
+    "conditional": conditional_checkout,
+    "select_for_update": locked_checkout,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Flash-sale contention benchmark: --threads workers buy one unit of "
+        "the same product until its --stock runs out, with each strategy in "
+        "turn. Reports checkouts/s and checks that nothing was oversold. "
+        "Creates and deletes a temporary product in the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--stock", type=int, default=500)
+        parser.add_argument(
+            "--work-ms",
+            type=float,
+            default=2.0,
+            help="Other checkout work inside the transaction (order rows).",
+        )
+        parser.add_argument("--strategy", choices=sorted(STRATEGIES), action="append")
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            self.stdout.write(
+                self.style.WARNING(
+                    "SQLite locks the whole database for writes and ignores "
+                    "select_for_update; run against PostgreSQL for numbers "
+                    "that mean something."
+                )
+            )
+        for name in options["strategy"] or sorted(STRATEGIES):
+            self.run(name, STRATEGIES[name], options)
+
+    def run(self, name, checkout, options):
+        product = Product.objects.create(
+            name="Benchmark stock",
+            slug=f"benchmark-stock-{uuid.uuid4().hex[:12]}",
+            description="Temporary product created by benchmark_stock.",
+            price=1,
+            stock=options["stock"],
+            featured=False,
+        )
+        delay = options["work_ms"] / 1000
+
+        def work():
+            time.sleep(delay)
+
+        sold = [0] * options["threads"]
+        retries = [0] * options["threads"]
+        start = threading.Barrier(options["threads"] + 1)
+
+        def worker(index):
+            start.wait()
+            try:
+                while True:
+                    try:
+                        with transaction.atomic():
+                            checkout(product.pk, work)
+                    except InsufficientStock:
+                        return
+                    except OperationalError:
+                        # SQLite: "database is locked" past the busy timeout.
+                        retries[index] += 1
+                        continue
+                    sold[index] += 1
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(index,))
+            for index in range(options["threads"])
+        ]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        product.refresh_from_db(fields=["stock"])
+        remaining = product.stock
+        product.delete()
+
+        total = sum(sold)
+        oversold = total + remaining - options["stock"]
+        line = (
+            f"{name:<18} {total:6d} sold in {elapsed:6.2f}s  "
+            f"{total / elapsed:8.1f} checkouts/s  {sum(retries)} retries  "
+            f"{remaining} left"
+        )
+        if oversold:
+            self.stdout.write(self.style.ERROR(f"{line}  OVERSOLD {oversold}"))
+        else:
+            self.stdout.write(line)
@@ -0,0 +1,123 @@
+import math
+import time
+from collections import defaultdict
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from apps.orders.models import OrderItem
+from apps.products.cache import SCORES_VERSION_KEY, bump_catalog_version
+from apps.products.models import Product
+from apps.reviews.models import Review
+from apps.wishlist.models import Wishlist
+
+
+# Points per event: each unit ordered, each wishlist addition, each review.
+ORDER_WEIGHT = 1.0
+WISHLIST_WEIGHT = 0.5
+REVIEW_WEIGHT = 2.0
+
+# Decayed trending scores drift a little on every run; changes smaller than
+# this (relative, or absolute near zero) are not written.
+SCORE_TOLERANCE = 0.01
+
+
+def score_changed(old, new):
+    return not math.isclose(old, new, rel_tol=SCORE_TOLERANCE, abs_tol=SCORE_TOLERANCE)
+
+
+def score_events(since):
+    """Yield ``(product_id, happened_at, points)`` for every event after ``since``."""
+    orders = (
+        OrderItem.objects.exclude(order__status="cancelled")
+        .filter(order__created_at__gte=since)
+        .values_list("product_id", "order__created_at", "quantity")
+    )
+    for product_id, created_at, quantity in orders.iterator(chunk_size=5000):
+        yield product_id, created_at, quantity * ORDER_WEIGHT
+
+    wishlist = Wishlist.objects.filter(created_at__gte=since).values_list(
+        "product_id", "created_at"
+    )
+    for product_id, created_at in wishlist.iterator(chunk_size=5000):
+        yield product_id, created_at, WISHLIST_WEIGHT
+
+    reviews = Review.objects.filter(created_at__gte=since).values_list(
+        "product_id", "created_at"
+    )
+    for product_id, created_at in reviews.iterator(chunk_size=5000):
+        yield product_id, created_at, REVIEW_WEIGHT
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Product.popularity_score (orders, wishlist additions and "
+        "reviews over the last --days) and Product.trending_score (the same "
+        "events, exponentially decayed with --half-life) and write back in bulk "
+        "the ones that moved by more than 1%. Run it periodically (e.g. hourly)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="Window of events counted by popularity_score.",
+        )
+        parser.add_argument(
+            "--half-life",
+            type=float,
+            default=72,
+            help="Hours after which an event counts half in trending_score.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        now = timezone.now()
+        half_life = options["half_life"] * 3600
+
+        popularity = defaultdict(float)
+        trending = defaultdict(float)
+        for product_id, happened_at, points in score_events(
+            now - timedelta(days=options["days"])
+        ):
+            age = max((now - happened_at).total_seconds(), 0)
+            popularity[product_id] += points
+            trending[product_id] += points * 0.5 ** (age / half_life)
+
+        changed = []
+        current = Product.objects.values_list(
+            "id", "popularity_score", "trending_score"
+        )
+        for pk, old_popularity, old_trending in current.iterator(chunk_size=5000):
+            new_popularity = round(popularity.get(pk, 0.0), 4)
+            new_trending = round(trending.get(pk, 0.0), 4)
+            if score_changed(old_popularity, new_popularity) or score_changed(
+                old_trending, new_trending
+            ):
+                changed.append(
+                    Product(
+                        pk=pk,
+                        popularity_score=new_popularity,
+                        trending_score=new_trending,
+                    )
+                )
+
+        # Scores are not content: updated_at, and with it product detail and
+        # the catalog ETags, stays as it is. Only the score sorts move.
+        with transaction.atomic():
+            Product.objects.bulk_update(
+                changed,
+                ["popularity_score", "trending_score"],
+                batch_size=options["batch_size"],
+            )
+        if changed:
+            bump_catalog_version(SCORES_VERSION_KEY)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Updated the scores of {len(changed)} products in "
+                f"{time.monotonic() - started:.1f}s."
+            )
+        )
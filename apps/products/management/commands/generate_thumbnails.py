@@ -0,0 +1,101 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+from apps.products.cache import bump_catalog_version, invalidate_product_detail
+from apps.products.images import generate_derivatives
+from apps.products.models import Category, Product
+
+
+def _generate(task):
+    """Process-pool worker: only touches storage, never the database."""
+    model_label, pk, name = task
+    try:
+        return model_label, pk, generate_derivatives(name), None
+    except Exception as e:
+        return model_label, pk, None, str(e)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the WebP/JPEG thumbnails of existing product and category "
+        "images across a pool of worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes (default: number of CPUs).",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Regenerate images that already have thumbnails too.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        models = {"product": Product, "category": Category}
+        tasks = []
+        for label, model in models.items():
+            queryset = model.objects.exclude(image="").exclude(image__isnull=True)
+            if not options["all"]:
+                queryset = queryset.filter(image_variants={})
+            tasks.extend(
+                (label, pk, name)
+                for pk, name in queryset.order_by().values_list("id", "image")
+            )
+
+        if not tasks:
+            self.stdout.write("No images to process.")
+            return
+
+        started = time.monotonic()
+        if options["workers"] > 1:
+            # Forked workers must not inherit open database connections.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+                results = pool.map(_generate, tasks, chunksize=8)
+                done, failed = self.save_results(results, models, options)
+        else:
+            done, failed = self.save_results(map(_generate, tasks), models, options)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated thumbnails for {done} images in {elapsed:.1f}s "
+                f"({failed} failed)."
+            )
+        )
+
+    def flush(self, model, objects):
+        model.objects.bulk_update(objects, ["image_variants", "updated_at"])
+        if model is Product:
+            slugs = Product.objects.filter(pk__in=[obj.pk for obj in objects])
+            invalidate_product_detail(*slugs.values_list("slug", flat=True))
+        bump_catalog_version()
+
+    def save_results(self, results, models, options):
+        done = failed = 0
+        pending = {label: [] for label in models}
+        for label, pk, variants, error in results:
+            if error:
+                failed += 1
+                self.stderr.write(f"{label} {pk}: {error}")
+                continue
+            pending[label].append(
+                models[label](pk=pk, image_variants=variants, updated_at=timezone.now())
+            )
+            done += 1
+            if len(pending[label]) >= options["batch_size"]:
+                self.flush(models[label], pending[label])
+                pending[label] = []
+
+        for label, objects in pending.items():
+            if objects:
+                self.flush(models[label], objects)
+        return done, failed
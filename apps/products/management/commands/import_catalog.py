@@ -0,0 +1,243 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import slugify
+from apps.products.cache import bump_catalog_version, invalidate_product_detail
+from apps.products.models import Category, Product, make_excerpt
+
+
+UPDATE_FIELDS = [
+    "name",
+    "description",
+    "excerpt",
+    "price",
+    "featured",
+    "category",
+    "updated_at",
+]
+
+TRUE_VALUES = {"1", "true", "yes", "sim", "y"}
+
+
+def read_rows(path, file_format):
+    """Yield ``(row_number, row)`` from a CSV or JSON Lines file, streaming."""
+    with open(path, newline="", encoding="utf-8") as handle:
+        if file_format == "csv":
+            for number, row in enumerate(csv.DictReader(handle), start=1):
+                yield number, row
+        else:
+            number = 0
+            for line in handle:
+                if line.strip():
+                    number += 1
+                    yield number, json.loads(line)
+
+
+def unique_slug(value, taken):
+    """Allocate a slug not in ``taken`` (and reserve it)."""
+    base = slugify(value) or "item"
+    slug = base
+    counter = 1
+    while slug in taken:
+        slug = f"{base}-{counter}"
+        counter += 1
+    taken.add(slug)
+    return slug
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a supplier catalog (CSV or JSON Lines) into Product and Category "
+        "in transactional batches. Rows with a slug update the matching product; "
+        "rows without one create a new product."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or .jsonl file to import.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="Input format (default: guessed from the file extension).",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Skip the rows committed by a previous, interrupted run.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Progress file (default: <path>.checkpoint).",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+
+        file_format = options["format"] or (
+            "jsonl" if path.suffix in (".jsonl", ".ndjson") else "csv"
+        )
+        batch_size = options["batch_size"]
+        checkpoint = Path(options["checkpoint"] or f"{path}.checkpoint")
+
+        done = 0
+        # Slugs given to slugless rows of a batch that may have committed
+        # after its checkpoint was last written; replaying the batch reuses
+        # them, so it updates those products instead of creating copies.
+        self.replay_slugs = {}
+        if options["resume"] and checkpoint.exists():
+            state = json.loads(checkpoint.read_text())
+            done = state["rows"]
+            self.replay_slugs = {
+                int(n): slug for n, slug in state.get("slugs", {}).items()
+            }
+            self.stdout.write(f"Resuming after row {done}.")
+        self.done = done
+
+        # Everything the per-row work needs is loaded once up front.
+        self.categories = dict(Category.objects.values_list("name", "id"))
+        self.category_slugs = set(Category.objects.values_list("slug", flat=True))
+        self.product_slugs = set(
+            Product.objects.values_list("slug", flat=True).iterator()
+        )
+
+        started = time.monotonic()
+        imported = 0
+        batch = []
+        for number, row in read_rows(path, file_format):
+            if number <= done:
+                continue
+            batch.append((number, row))
+            if len(batch) >= batch_size:
+                imported += self.write_batch(batch, checkpoint)
+                self.report(imported, started)
+                batch = []
+        if batch:
+            imported += self.write_batch(batch, checkpoint)
+
+        checkpoint.unlink(missing_ok=True)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {imported} rows in {elapsed:.1f}s "
+                f"({imported / elapsed:.0f} rows/s)."
+            )
+        )
+
+    def report(self, imported, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f"{imported} rows ({imported / elapsed:.0f} rows/s)")
+
+    def resolve_categories(self, names):
+        """Create the categories not seen before, in one insert per batch."""
+        new_names = {name for name in names if name and name not in self.categories}
+        if not new_names:
+            return
+        Category.objects.bulk_create(
+            [
+                Category(name=name, slug=unique_slug(name, self.category_slugs))
+                for name in sorted(new_names)
+            ]
+        )
+        self.categories.update(
+            Category.objects.filter(name__in=new_names).values_list("name", "id")
+        )
+
+    def build_product(self, number, row):
+        name = (row.get("name") or "").strip()
+        if not name:
+            raise CommandError(f"Row {number}: missing name.")
+        try:
+            price = Decimal(str(row.get("price")).strip())
+        except InvalidOperation:
+            price = None
+        if price is None or not price.is_finite() or price < 0:
+            raise CommandError(f"Row {number}: invalid price {row.get('price')!r}.")
+
+        featured = row.get("featured")
+        if isinstance(featured, str):
+            featured = featured.strip().lower()
+            featured = not featured or featured in TRUE_VALUES
+        elif featured is None:
+            featured = True
+
+        slug = (row.get("slug") or "").strip() or self.replay_slugs.get(number)
+        if slug:
+            self.product_slugs.add(slug)
+            created = False
+        else:
+            slug = unique_slug(name, self.product_slugs)
+            created = True
+
+        category = (row.get("category") or "").strip()
+        description = row.get("description") or ""
+        product = Product(
+            name=name,
+            slug=slug,
+            description=description,
+            # bulk_create skips save(), so the excerpt is set here.
+            excerpt=make_excerpt(description),
+            price=price,
+            featured=bool(featured),
+        )
+        return product, category, created
+
+    def claim_new_slugs(self, new):
+        """
+        Move the new products off slugs taken since ``product_slugs`` was
+        loaded, so that they are inserted, never upserted over someone
+        else's product.
+        """
+        taken = set(
+            Product.objects.filter(
+                slug__in=[p.slug for p, _ in new.values()]
+            ).values_list("slug", flat=True)
+        )
+        self.product_slugs |= taken
+        for product, _ in new.values():
+            if product.slug in taken:
+                product.slug = unique_slug(product.name, self.product_slugs)
+
+    def write_batch(self, batch, checkpoint):
+        products, new = {}, {}
+        for number, row in batch:
+            product, category, created = self.build_product(number, row)
+            if created:
+                new[number] = (product, category)
+            else:
+                # Last row wins when a batch repeats a slug.
+                products[product.slug] = (product, category)
+
+        with transaction.atomic():
+            everything = [*products.values(), *new.values()]
+            self.resolve_categories(category for _, category in everything)
+            for product, category in everything:
+                product.category_id = self.categories.get(category)
+
+            self.claim_new_slugs(new)
+            # Should the process die between the commit and the checkpoint
+            # below, a resume replays this batch with the same slugs.
+            slugs = {number: product.slug for number, (product, _) in new.items()}
+            checkpoint.write_text(json.dumps({"rows": self.done, "slugs": slugs}))
+
+            Product.objects.bulk_create(
+                [product for product, _ in products.values()],
+                update_conflicts=True,
+                unique_fields=["slug"],
+                update_fields=UPDATE_FIELDS,
+            )
+            # A slug claimed concurrently since claim_new_slugs() makes this
+            # fail instead of overwriting; the batch can then be resumed.
+            Product.objects.bulk_create([product for product, _ in new.values()])
+        # bulk_create sends no signals, so do what they would have.
+        invalidate_product_detail(*[product.slug for product, _ in everything])
+        bump_catalog_version()
+
+        self.done = batch[-1][0]
+        checkpoint.write_text(json.dumps({"rows": self.done}))
+        return len(batch)
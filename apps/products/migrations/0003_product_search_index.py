@@ -0,0 +1,170 @@
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE products_product_fts USING fts5(
+        name, category_name, description,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO products_product_fts (rowid, name, category_name, description)
+    SELECT p.id, p.name, c.name, p.description
+    FROM products_product p
+    LEFT JOIN products_category c ON c.id = p.category_id
+    """,
+    """
+    CREATE TRIGGER products_product_fts_ai AFTER INSERT ON products_product
+    BEGIN
+        INSERT INTO products_product_fts (rowid, name, category_name, description)
+        VALUES (
+            new.id,
+            new.name,
+            (SELECT name FROM products_category WHERE id = new.category_id),
+            new.description
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER products_product_fts_au
+    AFTER UPDATE OF name, description, category_id ON products_product
+    BEGIN
+        DELETE FROM products_product_fts WHERE rowid = old.id;
+        INSERT INTO products_product_fts (rowid, name, category_name, description)
+        VALUES (
+            new.id,
+            new.name,
+            (SELECT name FROM products_category WHERE id = new.category_id),
+            new.description
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER products_product_fts_ad AFTER DELETE ON products_product
+    BEGIN
+        DELETE FROM products_product_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER products_category_fts_au
+    AFTER UPDATE OF name ON products_category
+    BEGIN
+        UPDATE products_product_fts SET category_name = new.name
+        WHERE rowid IN (SELECT id FROM products_product WHERE category_id = new.id);
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS products_category_fts_au",
+    "DROP TRIGGER IF EXISTS products_product_fts_ad",
+    "DROP TRIGGER IF EXISTS products_product_fts_au",
+    "DROP TRIGGER IF EXISTS products_product_fts_ai",
+    "DROP TABLE IF EXISTS products_product_fts",
+]
+
+POSTGRES_FORWARD = [
+    "ALTER TABLE products_product ADD COLUMN search_vector tsvector",
+    """
+    CREATE FUNCTION products_product_search_vector(
+        p_name text, p_category text, p_description text
+    ) RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('simple', coalesce(p_name, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(p_category, '')), 'B')
+            || setweight(to_tsvector('simple', coalesce(p_description, '')), 'C')
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+    """
+    CREATE FUNCTION products_product_search_trigger() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := products_product_search_vector(
+            NEW.name,
+            (SELECT name FROM products_category WHERE id = NEW.category_id),
+            NEW.description
+        );
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER products_product_search_update
+    BEFORE INSERT OR UPDATE OF name, description, category_id ON products_product
+    FOR EACH ROW EXECUTE FUNCTION products_product_search_trigger()
+    """,
+    """
+    CREATE FUNCTION products_category_search_trigger() RETURNS trigger AS $$
+    BEGIN
+        UPDATE products_product
+        SET search_vector = products_product_search_vector(name, NEW.name, description)
+        WHERE category_id = NEW.id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER products_category_search_update
+    AFTER UPDATE OF name ON products_category
+    FOR EACH ROW EXECUTE FUNCTION products_category_search_trigger()
+    """,
+    """
+    UPDATE products_product p
+    SET search_vector = products_product_search_vector(
+        p.name,
+        (SELECT name FROM products_category c WHERE c.id = p.category_id),
+        p.description
+    )
+    """,
+    """
+    CREATE INDEX products_product_search_vector_gin
+    ON products_product USING gin (search_vector)
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS products_product_search_vector_gin",
+    "DROP TRIGGER IF EXISTS products_category_search_update ON products_category",
+    "DROP FUNCTION IF EXISTS products_category_search_trigger()",
+    "DROP TRIGGER IF EXISTS products_product_search_update ON products_product",
+    "DROP FUNCTION IF EXISTS products_product_search_trigger()",
+    "DROP FUNCTION IF EXISTS products_product_search_vector(text, text, text)",
+    "ALTER TABLE products_product DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def fts5_available(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any("ENABLE_FTS5" in row[0] for row in cursor.fetchall())
+
+
+def run_statements(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite" and fts5_available(schema_editor.connection):
+        run_statements(schema_editor, SQLITE_FORWARD)
+    elif vendor == "postgresql":
+        run_statements(schema_editor, POSTGRES_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        run_statements(schema_editor, SQLITE_BACKWARD)
+    elif vendor == "postgresql":
+        run_statements(schema_editor, POSTGRES_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0002_rename_cateagory_product_category_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0003_product_search_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["category", "id"], name="product_category_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from importlib import import_module
+from django.db import migrations, models
+import django.utils.timezone
+
+
+search_triggers = import_module("apps.products.migrations._search_triggers")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0004_product_category_id_idx"),
+    ]
+
+    operations = [
+        # SQLite rebuilds both tables to add the columns; 0012 recreates the
+        # triggers once 0006 to 0011 are done rebuilding them too.
+        migrations.RunPython(
+            search_triggers.drop_sqlite_search_triggers,
+            search_triggers.create_sqlite_search_triggers,
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.23 on 2026-10-18 11:05
+
+import html
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+
+def make_excerpt(description):
+    # Frozen copy of apps.products.models.make_excerpt as of this migration,
+    # so later changes to the model code cannot alter or break it.
+    text = " ".join(html.unescape(strip_tags(description or "")).split())
+    return Truncator(text).chars(160)
+
+
+def fill_excerpts(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    batch = []
+    for product in Product.objects.only("id", "description").iterator(chunk_size=1000):
+        product.excerpt = make_excerpt(product.description)
+        batch.append(product)
+        if len(batch) >= 1000:
+            Product.objects.bulk_update(batch, ["excerpt"])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ["excerpt"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0007_image_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="excerpt",
+            field=models.CharField(blank=True, editable=False, max_length=160),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0009_relatedproduct"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="popularity_score",
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="trending_score",
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["featured", "-popularity_score", "-id"],
+                name="product_featured_popular_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["featured", "-trending_score", "-id"],
+                name="product_featured_trending_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from importlib import import_module
+from django.db import migrations
+
+
+search_triggers = import_module("apps.products.migrations._search_triggers")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0011_product_stock"),
+    ]
+
+    # 0005 dropped the SQLite triggers so that SQLite could rebuild the product
+    # and category tables for their new columns; 0005 to 0011 are done
+    # rebuilding, so put them back and resync rows written in between. Later
+    # migrations that rebuild those tables wrap their operations in
+    # search_triggers.without_sqlite_search_triggers() instead.
+    operations = [
+        migrations.RunPython(
+            search_triggers.create_sqlite_search_triggers,
+            search_triggers.drop_sqlite_search_triggers,
+        ),
+    ]
@@ -0,0 +1,81 @@
+from django.db import migrations
+
+
+# search_terms() strips accents from queries; store the PostgreSQL
+# search_vector without them too, as the SQLite FTS5 tokenizer
+# (remove_diacritics) already does.
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() is only STABLE; pinning the dictionary makes the wrapper
+    # safe to use from the IMMUTABLE search vector function.
+    """
+    CREATE OR REPLACE FUNCTION products_unaccent(text) RETURNS text AS $$
+        SELECT unaccent('unaccent', $1)
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    """
+    CREATE OR REPLACE FUNCTION products_product_search_vector(
+        p_name text, p_category text, p_description text
+    ) RETURNS tsvector AS $$
+        SELECT setweight(
+                to_tsvector('simple', products_unaccent(coalesce(p_name, ''))), 'A'
+            )
+            || setweight(
+                to_tsvector('simple', products_unaccent(coalesce(p_category, ''))),
+                'B'
+            )
+            || setweight(
+                to_tsvector('simple', products_unaccent(coalesce(p_description, ''))),
+                'C'
+            )
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    """
+    CREATE OR REPLACE FUNCTION products_product_search_vector(
+        p_name text, p_category text, p_description text
+    ) RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('simple', coalesce(p_name, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(p_category, '')), 'B')
+            || setweight(to_tsvector('simple', coalesce(p_description, '')), 'C')
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+]
+
+REINDEX = """
+    UPDATE products_product p
+    SET search_vector = products_product_search_vector(
+        p.name,
+        (SELECT name FROM products_category c WHERE c.id = p.category_id),
+        p.description
+    )
+"""
+
+
+def unaccent_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for statement in [*POSTGRES_FORWARD, REINDEX]:
+            schema_editor.execute(statement)
+
+
+def restore_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for statement in [
+            *POSTGRES_BACKWARD,
+            REINDEX,
+            "DROP FUNCTION IF EXISTS products_unaccent(text)",
+        ]:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0012_restore_sqlite_search_triggers"),
+    ]
+
+    operations = [
+        migrations.RunPython(unaccent_search_vector, restore_search_vector),
+    ]
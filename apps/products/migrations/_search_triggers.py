@@ -0,0 +1,71 @@
+"""
+Helpers for migrations that rebuild ``products_product`` or
+``products_category`` on SQLite.
+
+SQLite changes most columns by copying the table into a new one, and it
+refuses to do that while the FTS5 triggers of 0003 reference the table
+("error in trigger products_product_fts_ai: no such table"). Wrap such
+operations::
+
+    from importlib import import_module
+
+    search_triggers = import_module("apps.products.migrations._search_triggers")
+
+    operations = search_triggers.without_sqlite_search_triggers(
+        migrations.AddField(...),
+    )
+
+The triggers are dropped before the operations and recreated after them,
+with the index rebuilt from the tables. On other databases, and on SQLite
+builds without FTS5, the wrapper adds nothing that runs.
+
+The leading underscore keeps Django's migration loader from reading this
+module as a migration.
+"""
+
+from importlib import import_module
+from django.db import migrations
+
+
+search_index = import_module("apps.products.migrations.0003_product_search_index")
+
+SEARCH_TABLE = "products_product_fts"
+
+DROP_TRIGGERS = search_index.SQLITE_BACKWARD[:4]
+
+
+def _has_search_table(connection):
+    return (
+        connection.vendor == "sqlite"
+        and SEARCH_TABLE in connection.introspection.table_names()
+    )
+
+
+def drop_sqlite_search_triggers(apps, schema_editor):
+    if _has_search_table(schema_editor.connection):
+        search_index.run_statements(schema_editor, DROP_TRIGGERS)
+
+
+def create_sqlite_search_triggers(apps, schema_editor):
+    # Rows written while the triggers were gone are not in the index, so it
+    # is rebuilt from the tables. Dropping first makes this safe to rerun.
+    if _has_search_table(schema_editor.connection):
+        statements = [
+            *DROP_TRIGGERS,
+            f"DELETE FROM {SEARCH_TABLE}",
+            *search_index.SQLITE_FORWARD[1:],
+        ]
+        search_index.run_statements(schema_editor, statements)
+
+
+def without_sqlite_search_triggers(*operations):
+    """``operations`` with the SQLite search triggers dropped around them."""
+    return [
+        migrations.RunPython(
+            drop_sqlite_search_triggers, create_sqlite_search_triggers
+        ),
+        *operations,
+        migrations.RunPython(
+            create_sqlite_search_triggers, drop_sqlite_search_triggers
+        ),
+    ]
@@ -1,15 +1,35 @@
+import html
 from django.db import models
-from django.utils.text import slugify
+from django.utils.html import strip_tags
+from django.utils.text import Truncator, slugify
+
+
+EXCERPT_LENGTH = 160
+
+
+def make_excerpt(description):
+    """Plain-text start of ``description`` for list views."""
+    text = " ".join(html.unescape(strip_tags(description or "")).split())
+    return Truncator(text).chars(EXCERPT_LENGTH)
 
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True, blank=True)
     image = models.ImageField(upload_to="category_img", blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored image so a new upload can be detected.
+        instance._loaded_image = instance.__dict__.get("image")
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
@@ -25,9 +45,13 @@ class Category(models.Model):
 class Product(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
+    # Kept in sync with description by save() and import_catalog; list
+    # serializers return it so description is only loaded for product detail.
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     slug = models.SlugField(unique=True, blank=True)
     image = models.ImageField(upload_to="product_img", blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     featured = models.BooleanField(default=True)
     category = models.ForeignKey(
         Category,
@@ -36,16 +60,56 @@ class Product(models.Model):
         blank=True,
         null=True,
     )
+    # Units available; empty means the product is not stock-tracked. Only
+    # ever decremented with a conditional UPDATE, see stock.reserve_stock().
+    stock = models.PositiveIntegerField(blank=True, null=True)
     average_rating = models.FloatField(default=0.0)
     total_reviews = models.PositiveIntegerField(default=0)
+    # Written in bulk by manage.py compute_product_scores.
+    popularity_score = models.FloatField(default=0.0, editable=False)
+    trending_score = models.FloatField(default=0.0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ["-id"]
+        indexes = [
+            models.Index(fields=["category", "id"], name="product_category_id_idx"),
+            # Faceted filtering on product_list.
+            models.Index(
+                fields=["featured", "price"], name="product_featured_price_idx"
+            ),
+            models.Index(
+                fields=["featured", "average_rating"],
+                name="product_featured_rating_idx",
+            ),
+            models.Index(
+                fields=["category", "price"], name="product_category_price_idx"
+            ),
+            # sort=popular / sort=trending on product_list.
+            models.Index(
+                fields=["featured", "-popularity_score", "-id"],
+                name="product_featured_popular_idx",
+            ),
+            models.Index(
+                fields=["featured", "-trending_score", "-id"],
+                name="product_featured_trending_idx",
+            ),
+        ]
         # ordering = ["-average_rating"]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored slug and image so a slug edit can invalidate
+        # the old cache entry and a new upload can be detected (see
+        # signals.py).
+        instance._loaded_slug = instance.__dict__.get("slug")
+        instance._loaded_image = instance.__dict__.get("image")
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
@@ -55,4 +119,54 @@ class Product(models.Model):
                 unique_slug = f"{self.slug}-{counter}"
                 counter += 1
             self.slug = unique_slug
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            self.excerpt = make_excerpt(self.description)
+        elif "description" in update_fields:
+            self.excerpt = make_excerpt(self.description)
+            kwargs["update_fields"] = {*update_fields, "excerpt"}
         super().save(*args, **kwargs)
+
+
+class RelatedProduct(models.Model):
+    """
+    "Frequently bought together" neighbours of ``product``, best first.
+    Precomputed from order history by ``manage.py compute_related_products``;
+    never written by requests.
+    """
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="related_products"
+    )
+    related = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="recommended_with"
+    )
+    rank = models.PositiveSmallIntegerField()
+    # Cosine similarity of the two products' order sets.
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ["product", "rank"]
+        constraints = [
+            # Also the index behind the per-product lookup.
+            models.UniqueConstraint(
+                fields=["product", "rank"], name="related_product_rank_unique"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.product} -> {self.related}"
+
+
+class CatalogVersion(models.Model):
+    """
+    Catalog ETag versions (see ``cache.catalog_version``) when the cache is
+    private to each process: a row every process reads, so a bump made by a
+    management command reaches the web workers too.
+    """
+
+    key = models.CharField(max_length=50, primary_key=True)
+    version = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"{self.key}={self.version}"
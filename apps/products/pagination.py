@@ -0,0 +1,148 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+
+
+class ProductPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class ProductCursorPagination(CursorPagination):
+    """
+    Keyset pagination: seeks by the ordering columns instead of using
+    ``OFFSET`` and never runs a ``COUNT(*)``, so deep pages cost the same as
+    the first one. The response has ``next``/``previous`` but no ``count``.
+
+    DRF's ``CursorPagination`` keys on the first ordering column only and
+    falls back to an offset inside runs of equal values, which a score sort
+    (mostly ``0.0``) is full of. The cursor here holds every ordering column,
+    e.g. ``2.5,17`` for ``("-popularity_score", "-id")``; ending the ordering
+    with the id makes every position unique, so no page needs an offset.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = "-id"
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+        position = self.cursor.position if self.cursor else None
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(
+                order[1:] if order.startswith("-") else f"-{order}"
+                for order in ordering
+            )
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(
+                self._seek(ordering, self._parse_position(queryset.model, position))
+            )
+
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = (
+            self._get_position_from_instance(self.page[-1], self.ordering)
+            if self.page
+            else self.cursor.position
+        )
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = (
+            self._get_position_from_instance(self.page[0], self.ordering)
+            if self.page
+            else self.cursor.position
+        )
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            name = order.lstrip("-")
+            values.append(
+                instance[name]
+                if isinstance(instance, dict)
+                else getattr(instance, name)
+            )
+        return ",".join(str(value) for value in values)
+
+    def _parse_position(self, model, position):
+        values = position.split(",")
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [
+                model._meta.get_field(order.lstrip("-")).to_python(value)
+                for order, value in zip(self.ordering, values)
+            ]
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _seek(ordering, values):
+        """
+        Rows strictly after ``values`` in ``ordering``: ``(a < x) OR (a = x
+        AND b < y) ...`` for descending columns, behind a plain bound on the
+        first column so the database can range-scan its index.
+        """
+        names = [order.lstrip("-") for order in ordering]
+        descending = [order.startswith("-") for order in ordering]
+        after = Q()
+        for index, name in enumerate(names):
+            lookup = "lt" if descending[index] else "gt"
+            equal = dict(zip(names[:index], values[:index]))
+            after |= Q(**equal, **{f"{name}__{lookup}": values[index]})
+        if len(names) == 1:
+            return after
+        bound = "lte" if descending[0] else "gte"
+        return Q(**{f"{names[0]}__{bound}": values[0]}) & after
+
+
+def get_product_paginator(request, ordering=None):
+    """
+    Pick the paginator requested by the client.
+
+    Cursor mode is opt-in with ``?pagination=cursor`` (the ``next`` and
+    ``previous`` links keep the parameter); everything else stays on page
+    numbers so existing clients keep working.
+    """
+    if (
+        request.query_params.get("pagination") == "cursor"
+        or ProductCursorPagination.cursor_query_param in request.query_params
+    ):
+        return ProductCursorPagination(ordering=ordering)
+    return ProductPagination()
@@ -0,0 +1,96 @@
+import re
+import unicodedata
+from django.db import connection
+from django.db.models import Q
+
+
+SEARCH_TABLE = "products_product_fts"
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+# Column weights for bm25(): name, category_name, description.
+SQLITE_WEIGHTS = (10.0, 5.0, 1.0)
+
+_index_available = {}
+
+
+def search_terms(query):
+    """
+    Split a raw user query into normalized search terms: lowercase and
+    without accents, as both indexes store the text (FTS5's
+    ``remove_diacritics`` tokenizer, ``unaccent`` on PostgreSQL).
+    """
+    query = unicodedata.normalize("NFKD", query.lower())
+    query = "".join(char for char in query if not unicodedata.combining(char))
+    return TERM_RE.findall(query)
+
+
+def has_search_index():
+    """Whether the full-text index created by migration 0003 exists."""
+    key = (connection.alias, connection.settings_dict["NAME"])
+    if key not in _index_available:
+        if connection.vendor == "sqlite":
+            available = SEARCH_TABLE in connection.introspection.table_names()
+        elif connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                columns = connection.introspection.get_table_description(
+                    cursor, "products_product"
+                )
+            available = any(column.name == "search_vector" for column in columns)
+        else:
+            available = False
+        _index_available[key] = available
+    return _index_available[key]
+
+
+def _sqlite_search(queryset, terms):
+    # Every term is quoted and matched as a prefix so partial words typed in
+    # the search box still hit, e.g. "lap" -> "laptop".
+    match = " ".join('"{}"*'.format(term) for term in terms)
+    weights = ", ".join(str(weight) for weight in SQLITE_WEIGHTS)
+    return queryset.extra(
+        select={"rank": f"bm25({SEARCH_TABLE}, {weights})"},
+        tables=[SEARCH_TABLE],
+        where=[
+            f"{SEARCH_TABLE}.rowid = products_product.id",
+            f"{SEARCH_TABLE} MATCH %s",
+        ],
+        params=[match],
+    ).order_by("rank", "-id")
+
+
+def _postgres_search(queryset, terms):
+    tsquery = " & ".join(f"{term}:*" for term in terms)
+    return queryset.extra(
+        select={
+            "rank": "ts_rank(products_product.search_vector, to_tsquery('simple', %s))"
+        },
+        select_params=[tsquery],
+        where=["products_product.search_vector @@ to_tsquery('simple', %s)"],
+        params=[tsquery],
+    ).order_by("-rank", "-id")
+
+
+def _fallback_search(queryset, query):
+    return queryset.filter(
+        Q(name__icontains=query)
+        | Q(description__icontains=query)
+        | Q(category__name__icontains=query)
+    )
+
+
+def search_products(queryset, query):
+    """
+    Filter ``queryset`` by ``query`` and order it by relevance.
+
+    Uses the FTS5 table on SQLite and the ``search_vector`` GIN index on
+    PostgreSQL. Other backends fall back to ``icontains`` matching.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+
+    if not has_search_index():
+        return _fallback_search(queryset, query)
+    if connection.vendor == "sqlite":
+        return _sqlite_search(queryset, terms)
+    return _postgres_search(queryset, terms)
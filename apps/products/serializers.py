@@ -1,53 +1,127 @@
 from rest_framework import serializers
+from .images import srcset
 from .models import Category, Product
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ImageSrcsetMixin(serializers.Serializer):
+    image_srcset = serializers.SerializerMethodField()
+
+    def get_image_srcset(self, obj):
+        return srcset(obj.image_variants)
+
+
+class SparseFieldsMixin:
+    """
+    Sparse fieldsets: ``fields`` keeps only the named fields and ``omit``
+    drops the named ones. ``only_columns`` gives the model columns the
+    remaining fields read, to pass to ``QuerySet.only()``.
+    """
+
+    # Serializer fields whose value comes from other model columns.
+    source_columns = {"image_srcset": ["image_variants"]}
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in set(self.fields) - set(self.selected_fields(fields, omit)):
+            self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, fields=None, omit=None):
+        return [
+            name
+            for name in cls.Meta.fields
+            if (not fields or name in fields) and not (omit and name in omit)
+        ]
+
+    @classmethod
+    def only_columns(cls, fields=None, omit=None):
+        columns = ["id"]
+        for name in cls.selected_fields(fields, omit):
+            columns.extend(cls.source_columns.get(name, [name]))
+        return columns
+
+
+def sparse_fieldset(request, serializer_class):
+    """
+    Read ``?fields=`` and ``?omit=`` (comma separated) as ``(fields, omit)``
+    sets, ``None`` when absent. Raises ``ValueError`` for unknown names.
+    """
+    parsed = []
+    for param in ("fields", "omit"):
+        value = request.query_params.get(param)
+        names = {name.strip() for name in value.split(",")} - {""} if value else None
+        unknown = sorted((names or set()) - set(serializer_class.Meta.fields))
+        if unknown:
+            raise ValueError(f"Campos inválidos: {', '.join(unknown)}.")
+        parsed.append(names or None)
+    return tuple(parsed)
+
+
+class ProductListSerializer(
+    SparseFieldsMixin, ImageSrcsetMixin, serializers.ModelSerializer
+):
     class Meta:
         model = Product
         fields = [
             "id",
             "name",
             "slug",
-            "description",
+            "excerpt",
             "image",
+            "image_srcset",
             "price",
             "average_rating",
             "total_reviews",
         ]
 
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(
+    SparseFieldsMixin, ImageSrcsetMixin, serializers.ModelSerializer
+):
     category = serializers.SerializerMethodField()
-    
+
     class Meta:
         model = Product
-        fields = ["id", "name", "slug", "description", "image", "price", "category"]
-    
+        fields = [
+            "id",
+            "name",
+            "slug",
+            "description",
+            "image",
+            "image_srcset",
+            "price",
+            "stock",
+            "category",
+        ]
+
     def get_category(self, obj):
         if obj.category:
             return {
                 "id": obj.category.id,
                 "name": obj.category.name,
-                "slug": obj.category.slug
+                "slug": obj.category.slug,
             }
         return None
 
 
-class CategoryListSerialiizer(serializers.ModelSerializer):
+class CategoryListSerialiizer(ImageSrcsetMixin, serializers.ModelSerializer):
     product_count = serializers.SerializerMethodField()
-    
+
     class Meta:
         model = Category
-        fields = ["id", "name", "image", "slug", "product_count"]
-    
+        fields = ["id", "name", "image", "image_srcset", "slug", "product_count"]
+
     def get_product_count(self, obj):
+        # category_list annotates the count in the same query; fall back to a
+        # COUNT for categories loaded without the annotation.
+        if hasattr(obj, "product_count"):
+            return obj.product_count
         return obj.products.count()
 
 
-class CategoryDetailSerialiizer(serializers.ModelSerializer):
-    products = ProductListSerializer(many=True, read_only=True)
+class CategoryDetailSerialiizer(ImageSrcsetMixin, serializers.ModelSerializer):
+    # Products are paginated by the category_detail view, not nested here.
 
     class Meta:
         model = Category
-        fields = ["id", "name", "image", "products"]
+        fields = ["id", "name", "image", "image_srcset"]
@@ -0,0 +1,84 @@
+import logging
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .cache import bump_catalog_version, invalidate_product_detail
+from .images import image_changed, refresh_derivatives
+from .models import Category, Product
+from .suggest import suggestion_index
+
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_derivatives_on_commit(instance):
+    # The row is already committed: a bad image or a storage error must not
+    # turn the request into a 500 or keep the cache and version callbacks
+    # registered after this one from running.
+    def refresh():
+        try:
+            refresh_derivatives(instance)
+        except Exception:
+            logger.exception(
+                "Could not generate image derivatives for %s %s.",
+                type(instance).__name__,
+                instance.pk,
+            )
+
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=Product)
+def update_product_on_save(sender, instance, update_fields=None, **kwargs):
+    # Resizing is slow; keep it out of the transaction (and off rollbacks).
+    if image_changed(instance, update_fields):
+        refresh_derivatives_on_commit(instance)
+
+    # Also drop the slug the row was loaded with, in case it was edited.
+    # After the commit, so a concurrent read cannot cache the old row again.
+    slugs = [instance.slug, getattr(instance, "_loaded_slug", None)]
+    transaction.on_commit(lambda: invalidate_product_detail(*slugs))
+    transaction.on_commit(bump_catalog_version)
+    transaction.on_commit(lambda: suggestion_index.add_product(instance))
+
+
+@receiver(post_delete, sender=Product)
+def update_product_on_delete(sender, instance, **kwargs):
+    slug = instance.slug
+    transaction.on_commit(lambda: invalidate_product_detail(slug))
+    transaction.on_commit(bump_catalog_version)
+    pk = instance.pk
+    transaction.on_commit(lambda: suggestion_index.remove_product(pk))
+
+
+@receiver(post_save, sender=Category)
+def update_category_products_on_save(
+    sender, instance, created, update_fields=None, **kwargs
+):
+    if image_changed(instance, update_fields):
+        refresh_derivatives_on_commit(instance)
+
+    # Product detail and suggestions embed the category name.
+    products = [] if created else list(instance.products.values_list("id", "slug"))
+    slugs = [slug for _, slug in products]
+    transaction.on_commit(lambda: invalidate_product_detail(*slugs))
+    transaction.on_commit(bump_catalog_version)
+    transaction.on_commit(
+        lambda: suggestion_index.add_category(instance, len(products))
+    )
+
+
+@receiver(pre_delete, sender=Category)
+def collect_category_products_on_delete(sender, instance, **kwargs):
+    # SET_NULL detaches the products with a bulk UPDATE that sends no
+    # signals, so remember them while they can still be found.
+    instance._deleted_products = list(instance.products.values_list("id", "slug"))
+
+
+@receiver(post_delete, sender=Category)
+def update_category_products_on_delete(sender, instance, **kwargs):
+    category_pk = instance.pk
+    transaction.on_commit(bump_catalog_version)
+    transaction.on_commit(lambda: suggestion_index.remove_category(category_pk))
+    slugs = [slug for _, slug in getattr(instance, "_deleted_products", [])]
+    transaction.on_commit(lambda: invalidate_product_detail(*slugs))
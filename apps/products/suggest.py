@@ -0,0 +1,230 @@
+"""
+Per-worker in-memory prefix index for search-box autocomplete.
+
+Product and category names are normalized (lowercase, accents stripped) and
+every word offset of a name becomes a key in one sorted array, so "hd" finds
+"Cabo HDMI". A prefix lookup is two bisects plus a top-k over the matching
+range and never touches the database.
+
+The index is built lazily on the first lookup and patched from the product
+and category signals. Writes made by other workers are picked up by a full
+rebuild once the index is older than ``PRODUCT_SUGGEST_TTL`` seconds. Only
+one request runs that rebuild while the others keep serving the old index,
+and signal updates that arrive during it are replayed onto the new one.
+"""
+
+import heapq
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from django.conf import settings
+from django.db.models import Count
+from .models import Category, Product
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.split())
+
+
+def _keys(name):
+    words = normalize(name).split(" ")
+    return [" ".join(words[index:]) for index in range(len(words)) if words[index]]
+
+
+def product_popularity(product):
+    # Reviews rank products until compute_product_scores has run.
+    return (product.popularity_score, product.total_reviews)
+
+
+class SuggestionIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held for the whole of a rebuild, so only one runs at a time.
+        self._build_lock = threading.Lock()
+        self._keys = []  # sorted (key, entry_id) pairs
+        self._entries = {}  # entry_id -> (popularity, payload, keys)
+        self._product_categories = {}  # product pk -> category pk
+        self._built_at = None
+        # Updates received while a rebuild reads the database, replayed onto
+        # its result before it replaces the current index.
+        self._journal = None
+
+    def clear(self):
+        with self._lock:
+            self._keys = []
+            self._entries = {}
+            self._product_categories = {}
+            self._built_at = None
+
+    def _is_stale(self):
+        if self._built_at is None:
+            return True
+        return time.monotonic() - self._built_at > settings.PRODUCT_SUGGEST_TTL
+
+    def rebuild(self):
+        with self._build_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        with self._lock:
+            self._journal = []
+        try:
+            keys, entries, product_categories = self._load()
+        except Exception:
+            with self._lock:
+                self._journal = None
+            raise
+
+        with self._lock:
+            self._keys = keys
+            self._entries = entries
+            self._product_categories = product_categories
+            for apply, args in self._journal or ():
+                apply(*args)
+            self._journal = None
+            self._built_at = time.monotonic()
+
+    def _load(self):
+        keys = []
+        entries = {}
+        product_categories = {}
+
+        products = Product.objects.order_by().values_list(
+            "id", "name", "slug", "category_id", "popularity_score", "total_reviews"
+        )
+        for pk, name, slug, category_id, *popularity in products.iterator():
+            entry_id = ("product", pk)
+            entry_keys = _keys(name)
+            payload = {"type": "product", "name": name, "slug": slug}
+            entries[entry_id] = (tuple(popularity), payload, entry_keys)
+            keys.extend((key, entry_id) for key in entry_keys)
+            if category_id is not None:
+                product_categories[pk] = category_id
+
+        categories = Category.objects.annotate(product_count=Count("products"))
+        for category in categories.order_by():
+            entry_id = ("category", category.pk)
+            entry_keys = _keys(category.name)
+            payload = {
+                "type": "category",
+                "name": category.name,
+                "slug": category.slug,
+            }
+            entries[entry_id] = ((category.product_count, 0), payload, entry_keys)
+            keys.extend((key, entry_id) for key in entry_keys)
+
+        keys.sort()
+        return keys, entries, product_categories
+
+    def _update(self, apply, *args):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((apply, args))
+            if self._built_at is not None:
+                # Not built yet otherwise; the first lookup loads everything.
+                apply(*args)
+
+    def _put_locked(self, entry_id, popularity, payload, name):
+        self._remove_locked(entry_id)
+        entry_keys = _keys(name)
+        self._entries[entry_id] = (popularity, payload, entry_keys)
+        for key in entry_keys:
+            insort(self._keys, (key, entry_id))
+
+    def _remove_locked(self, entry_id):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for key in entry[2]:
+            index = bisect_left(self._keys, (key, entry_id))
+            if index < len(self._keys) and self._keys[index] == (key, entry_id):
+                del self._keys[index]
+
+    def _move_product_locked(self, pk, category_id):
+        # Keeps the product_count that ranks categories current.
+        old_category_id = self._product_categories.pop(pk, None)
+        if category_id is not None:
+            self._product_categories[pk] = category_id
+        if old_category_id != category_id:
+            self._count_locked(old_category_id, -1)
+            self._count_locked(category_id, 1)
+
+    def _count_locked(self, category_id, delta):
+        entry = self._entries.get(("category", category_id))
+        if entry is not None:
+            (product_count, _), payload, entry_keys = entry
+            self._entries[("category", category_id)] = (
+                (product_count + delta, 0),
+                payload,
+                entry_keys,
+            )
+
+    def _add_product_locked(self, product):
+        payload = {"type": "product", "name": product.name, "slug": product.slug}
+        self._put_locked(
+            ("product", product.pk), product_popularity(product), payload, product.name
+        )
+        self._move_product_locked(product.pk, product.category_id)
+
+    def _remove_product_locked(self, pk):
+        self._remove_locked(("product", pk))
+        self._move_product_locked(pk, None)
+
+    def _add_category_locked(self, category, product_count):
+        payload = {"type": "category", "name": category.name, "slug": category.slug}
+        self._put_locked(
+            ("category", category.pk), (product_count, 0), payload, category.name
+        )
+
+    def add_product(self, product):
+        self._update(self._add_product_locked, product)
+
+    def remove_product(self, pk):
+        self._update(self._remove_product_locked, pk)
+
+    def add_category(self, category, product_count):
+        self._update(self._add_category_locked, category, product_count)
+
+    def remove_category(self, pk):
+        self._update(self._remove_locked, ("category", pk))
+
+    def _refresh(self):
+        if self._built_at is None:
+            # Nothing to serve yet: the first lookups wait for one build.
+            with self._build_lock:
+                if self._built_at is None:
+                    self._rebuild()
+        elif self._is_stale() and self._build_lock.acquire(blocking=False):
+            # One request rebuilds; the others keep using the old index.
+            try:
+                if self._is_stale():
+                    self._rebuild()
+            finally:
+                self._build_lock.release()
+
+    def suggest(self, query, limit=10):
+        """Top ``limit`` entries whose name has a word starting with ``query``."""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        self._refresh()
+
+        with self._lock:
+            start = bisect_left(self._keys, (prefix,))
+            end = bisect_left(self._keys, (prefix + "\U0010ffff",), lo=start)
+            entry_ids = {entry_id for _, entry_id in self._keys[start:end]}
+            matches = [self._entries[entry_id] for entry_id in entry_ids]
+
+        # Most popular first, ties by name so results are stable.
+        best = heapq.nsmallest(
+            limit,
+            matches,
+            key=lambda entry: (tuple(-value for value in entry[0]), entry[1]["name"]),
+        )
+        return [payload for _, payload, _ in best]
+
+
+suggestion_index = SuggestionIndex()
@@ -1,7 +1,65 @@
-from django.test import TestCase
+import datetime
+import gzip
+import tempfile
+import uuid
+from decimal import Decimal
+from http import HTTPStatus
+from io import BytesIO, StringIO
+from importlib import import_module
+from importlib.util import find_spec
+from pathlib import Path
+from unittest import mock, skipUnless
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.forms.utils import ErrorList
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework import status
+from apps.orders.models import Order, OrderItem
+from apps.reviews.models import Review
+from apps.wishlist.models import Wishlist
+from infostore import middleware
+from infostore.middleware import CompressionMiddleware
+from .cache import bump_catalog_version, catalog_version, product_detail_key
+from .management.commands.import_catalog import Command
+from .fast import FastProductList
+from .filters import ProductFilter
 from .models import Category, Product
+from .serializers import ProductListSerializer
+from .suggest import suggestion_index
+
+search_triggers = import_module("apps.products.migrations._search_triggers")
+
+if find_spec("brotli"):
+    import brotli
+if find_spec("orjson"):
+    from infostore.parsers import ORJSONParser
+    from infostore.renderers import ORJSONRenderer
+
+
+def shared_cache():
+    """Run as if the default cache were shared by all processes (Redis)."""
+    return mock.patch("apps.products.cache.cache_is_shared", return_value=True)
+
 
 class CategoryModelTest(TestCase):
     def setUp(self):
@@ -40,6 +98,20 @@ class ProductModelTest(TestCase):
         self.product.featured = False
         self.assertEqual(self.product.featured, False)
 
+    def test_excerpt_strips_markup_and_truncates(self):
+        self.product.description = "<p>Fast &amp; <b>light</b></p>\n" + "word " * 100
+        self.product.save()
+        self.product.refresh_from_db()
+        self.assertTrue(self.product.excerpt.startswith("Fast & light word"))
+        self.assertLessEqual(len(self.product.excerpt), 160)
+        self.assertTrue(self.product.excerpt.endswith("…"))
+
+    def test_excerpt_follows_description_update_fields(self):
+        self.product.description = "Updated"
+        self.product.save(update_fields=["description"])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.excerpt, "Updated")
+
 
 class ProductsAPITest(TestCase):
     def setUp(self):
@@ -106,6 +178,22 @@ class ProductsAPITest(TestCase):
         self.assertIn("previous", response.data)
         self.assertIn("results", response.data)
     
+    def test_product_list_cursor_pagination(self):
+        response = self.client.get("/api/v2/product/?pagination=cursor&page_size=2")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data["previous"])
+        first_page = [p["name"] for p in response.data["results"]]
+        self.assertEqual(first_page, ["Python Programming", "Smartphone"])
+
+        response = self.client.get(response.data["next"])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p["name"] for p in response.data["results"]], ["Laptop"])
+        self.assertIsNone(response.data["next"])
+        self.assertIsNotNone(response.data["previous"])
+
     def test_product_detail_success(self):
         response = self.client.get(f"/api/v2/product/{self.featured_product1.slug}/")
         
@@ -131,12 +219,48 @@ class ProductsAPITest(TestCase):
         self.assertIn("Electronics", category_names)
         self.assertIn("Books", category_names)
     
+    def test_category_list_product_count_single_query(self):
+        with shared_cache(), self.assertNumQueries(1):
+            response = self.client.get("/api/v2/product/categories/")
+
+        counts = {c["name"]: c["product_count"] for c in response.data}
+        self.assertEqual(counts, {"Electronics": 3, "Books": 1})
+
+        # A per-process cache adds the CatalogVersion read.
+        self.client.get("/api/v2/product/categories/")
+        with self.assertNumQueries(2):
+            self.client.get("/api/v2/product/categories/")
+
     def test_category_detail_success(self):
         response = self.client.get(f"/api/v2/product/categories/{self.category1.slug}/")
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["name"], "Electronics")
     
+    def test_category_detail_paginates_products(self):
+        response = self.client.get(
+            f"/api/v2/product/categories/{self.category1.slug}/?page_size=2"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        products = response.data["products"]
+        self.assertEqual(products["count"], 3)
+        self.assertEqual(len(products["results"]), 2)
+        self.assertIsNotNone(products["next"])
+
+    def test_category_detail_cursor_pagination(self):
+        response = self.client.get(
+            f"/api/v2/product/categories/{self.category1.slug}/?pagination=cursor"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        products = response.data["products"]
+        self.assertNotIn("count", products)
+        self.assertEqual(
+            [p["name"] for p in products["results"]],
+            ["USB Cable", "Smartphone", "Laptop"],
+        )
+
     def test_category_detail_not_found(self):
         response = self.client.get("/api/v2/product/categories/nonexistent/")
         
@@ -193,3 +317,1207 @@ class ProductsAPITest(TestCase):
         self.assertIn("count", response.data)
         self.assertIn("results", response.data)
 
+
+
+class SearchTriggerMigrationTest(TransactionTestCase):
+    def test_table_rebuilds_keep_the_index_in_sync(self):
+        if "products_product_fts" not in connection.introspection.table_names():
+            self.skipTest("needs the SQLite FTS5 index")
+        category = Category.objects.create(name="Ecrãs")
+        Product.objects.create(
+            name="Monitor", description="", price=1, category=category
+        )
+
+        # What a migration wrapped in without_sqlite_search_triggers() does.
+        with connection.schema_editor() as editor:
+            search_triggers.drop_sqlite_search_triggers(None, editor)
+            editor._remake_table(Category)
+            editor._remake_table(Product)
+            Product.objects.create(name="Teclado", description="", price=1)
+            search_triggers.create_sqlite_search_triggers(None, editor)
+
+        Category.objects.filter(pk=category.pk).update(name="Monitores")
+        client = APIClient()
+        for query, name in [("monitores", "Monitor"), ("teclado", "Teclado")]:
+            response = client.get("/api/v2/product/search/", {"query": query})
+            self.assertEqual([p["name"] for p in response.data["results"]], [name])
+
+
+class ProductSearchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Acessórios")
+
+        self.monitor = Product.objects.create(
+            name="Monitor 27 polegadas",
+            description="Monitor para escritório",
+            price=250.00,
+        )
+        self.cable = Product.objects.create(
+            name="Cabo HDMI",
+            description="Compatível com qualquer monitor",
+            price=15.00,
+            category=self.category,
+        )
+
+    def search_names(self, query):
+        response = self.client.get("/api/v2/product/search/", {"query": query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [p["name"] for p in response.data["results"]]
+
+    def test_results_ordered_by_relevance(self):
+        # The cable is newer, so it comes first unless the ranking puts the
+        # name match ahead of its description match.
+        names = self.search_names("monitor")
+        self.assertEqual(names, ["Monitor 27 polegadas", "Cabo HDMI"])
+
+    def test_prefix_and_accent_insensitive_match(self):
+        self.assertIn("Monitor 27 polegadas", self.search_names("escritorio"))
+        self.assertIn("Monitor 27 polegadas", self.search_names("Escritório"))
+        self.assertIn("Cabo HDMI", self.search_names("acess"))
+        self.assertIn("Cabo HDMI", self.search_names("compatível"))
+
+    def test_index_follows_product_updates(self):
+        self.monitor.name = "Ecrã curvo"
+        self.monitor.save()
+
+        self.assertIn("Ecrã curvo", self.search_names("curvo"))
+        self.monitor.delete()
+        self.assertEqual(self.search_names("curvo"), [])
+
+    def test_index_follows_bulk_writes(self):
+        # QuerySet.update() and bulk_create() send no signals.
+        Product.objects.filter(pk=self.monitor.pk).update(name="Ecrã curvo")
+        Product.objects.bulk_create(
+            [Product(name="Teclado", slug="teclado", description="", price=30)]
+        )
+
+        self.assertEqual(self.search_names("curvo"), ["Ecrã curvo"])
+        self.assertEqual(self.search_names("teclado"), ["Teclado"])
+        Product.objects.filter(pk=self.monitor.pk).delete()
+        self.assertEqual(self.search_names("curvo"), [])
+
+    def test_index_follows_category_rename(self):
+        self.category.name = "Periféricos"
+        self.category.save()
+
+        self.assertEqual(self.search_names("perifericos"), ["Cabo HDMI"])
+        self.assertEqual(self.search_names("acessorios"), [])
+
+    def test_query_without_terms_returns_nothing(self):
+        self.assertEqual(self.search_names("!!!"), [])
+
+
+class ProductDetailCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Electronics")
+        self.product = Product.objects.create(
+            name="Laptop",
+            description="High performance laptop",
+            price=999.99,
+            category=self.category,
+        )
+        self.url = f"/api/v2/product/{self.product.slug}/"
+
+    def test_second_request_served_from_cache(self):
+        with shared_cache():
+            self.client.get(self.url)
+
+            with self.assertNumQueries(0):
+                response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["category"]["name"], "Electronics")
+
+        # A per-process cache checks the entry against the row first.
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_write_from_another_process_seen(self):
+        self.client.get(self.url)
+
+        # A management command's invalidation never reaches this process's
+        # locmem cache; the entry must still not be served.
+        Product.objects.filter(pk=self.product.pk).update(
+            price=899.99, updated_at=timezone.now()
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["price"], "899.99")
+
+        Category.objects.filter(pk=self.category.pk).delete()
+        response = self.client.get(self.url)
+        self.assertIsNone(response.data["category"])
+
+    def test_product_save_invalidates_cache(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = 899.99
+            self.product.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["price"], "899.99")
+
+    def test_slug_change_invalidates_old_slug(self):
+        self.client.get(self.url)
+        product = Product.objects.get(pk=self.product.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.slug = "laptop-pro"
+            product.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_category_rename_invalidates_cache(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = "Computers"
+            self.category.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["category"]["name"], "Computers")
+
+    def test_category_delete_invalidates_cache(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+
+        response = self.client.get(self.url)
+        self.assertIsNone(response.data["category"])
+
+    def test_invalidated_on_commit(self):
+        self.client.get(self.url)
+        key = product_detail_key(self.product.slug)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.product.price = 899.99
+            self.product.save()
+        # A read before the commit would still see the old row.
+        self.assertIsNotNone(cache.get(key))
+
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(key))
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Electronics")
+        self.product = Product.objects.create(
+            name="Laptop",
+            description="High performance laptop",
+            price=999.99,
+            category=self.category,
+        )
+
+    def assertNotModified(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        return etag
+
+    def test_product_list_not_modified(self):
+        etag = self.assertNotModified("/api/v2/product/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Mouse", description="Wireless", price=20)
+        response = self.client.get("/api/v2/product/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_etag_differs_per_page(self):
+        first = self.client.get("/api/v2/product/?page=1")
+        second = self.client.get("/api/v2/product/?page_size=1")
+        self.assertNotEqual(first["ETag"], second["ETag"])
+
+    def test_product_detail_not_modified(self):
+        url = f"/api/v2/product/{self.product.slug}/"
+        etag = self.assertNotModified(url)
+        self.assertIn("Last-Modified", self.client.get(url))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = "Computers"
+            self.category.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_category_list_changes_on_product_delete(self):
+        etag = self.assertNotModified("/api/v2/product/categories/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        response = self.client.get(
+            "/api/v2/product/categories/", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["product_count"], 0)
+
+    def test_category_detail_not_modified(self):
+        url = f"/api/v2/product/categories/{self.category.slug}/"
+        etag = self.assertNotModified(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = "Laptop Pro"
+            self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_needs_no_query(self):
+        with shared_cache():
+            etag = self.client.get("/api/v2/product/")["ETag"]
+
+            with self.assertNumQueries(0):
+                response = self.client.get(
+                    "/api/v2/product/", HTTP_IF_NONE_MATCH=etag
+                )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Otherwise one primary key lookup.
+        etag = self.client.get("/api/v2/product/")["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/v2/product/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_version_moved_by_another_process(self):
+        etag = self.assertNotModified("/api/v2/product/")
+
+        # The other process has its own locmem cache.
+        with mock.patch("apps.products.cache.cache", LocMemCache("other", {})):
+            bump_catalog_version()
+        response = self.client.get("/api/v2/product/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_facets_etag_covers_categories(self):
+        url = "/api/v2/product/?facets=true"
+        etag = self.assertNotModified(url)
+
+        # A queryset update sends no signals; the facets ETag sees it anyway.
+        Category.objects.filter(pk=self.category.pk).update(
+            name="Computers", updated_at=timezone.now() + datetime.timedelta(seconds=1)
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        names = {c["name"] for c in response.data["facets"]["categories"]}
+        self.assertIn("Computers", names)
+
+    def test_import_moves_catalog_version(self):
+        etag = self.assertNotModified("/api/v2/product/")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "catalog.csv"
+            path.write_text("name,price\nMouse,20\n", encoding="utf-8")
+            call_command("import_catalog", str(path), stdout=StringIO())
+        response = self.client.get("/api/v2/product/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ProductFilterTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.electronics = Category.objects.create(name="Electronics")
+        self.books = Category.objects.create(name="Books")
+
+        Product.objects.create(
+            name="Laptop",
+            description="Laptop",
+            price=999.99,
+            category=self.electronics,
+            average_rating=4.5,
+        )
+        Product.objects.create(
+            name="Mouse",
+            description="Mouse",
+            price=25.00,
+            category=self.electronics,
+            average_rating=3.2,
+        )
+        Product.objects.create(
+            name="Novel",
+            description="Novel",
+            price=15.00,
+            category=self.books,
+            average_rating=4.1,
+        )
+        Product.objects.create(
+            name="Old Cable",
+            description="Cable",
+            price=5.00,
+            category=self.electronics,
+            featured=False,
+        )
+
+    def names(self, params):
+        response = self.client.get("/api/v2/product/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(p["name"] for p in response.data["results"])
+
+    def test_filter_by_category(self):
+        self.assertEqual(self.names({"category": "books"}), ["Novel"])
+        self.assertEqual(
+            self.names({"category": "books,electronics"}), ["Laptop", "Mouse", "Novel"]
+        )
+
+    def test_filter_by_price_range_and_rating(self):
+        self.assertEqual(
+            self.names({"min_price": 10, "max_price": 100}), ["Mouse", "Novel"]
+        )
+        self.assertEqual(self.names({"min_rating": 4}), ["Laptop", "Novel"])
+
+    def test_filter_featured(self):
+        self.assertEqual(self.names({"featured": "false"}), ["Old Cable"])
+
+    def test_invalid_filter_value(self):
+        response = self.client.get("/api/v2/product/", {"min_price": "cheap"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("min_price", response.data)
+
+    def test_facets_only_when_requested(self):
+        response = self.client.get("/api/v2/product/")
+        self.assertNotIn("facets", response.data)
+
+    def test_facet_counts(self):
+        response = self.client.get(
+            "/api/v2/product/", {"facets": "true", "category": "electronics"}
+        )
+        facets = response.data["facets"]
+
+        # The category facet ignores the category filter itself.
+        categories = {c["slug"]: c["count"] for c in facets["categories"]}
+        self.assertEqual(categories, {"electronics": 2, "books": 1})
+
+        prices = [bucket["count"] for bucket in facets["price"]]
+        self.assertEqual(prices, [1, 0, 0, 1, 0])
+
+        ratings = {bucket["min"]: bucket["count"] for bucket in facets["rating"]}
+        self.assertEqual(ratings, {4: 1, 3: 2, 2: 2, 1: 2})
+
+
+class ProductSuggestTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        suggestion_index.clear()
+
+        self.category = Category.objects.create(name="Acessórios")
+        Product.objects.create(
+            name="Cabo HDMI",
+            description="Cabo",
+            price=15.00,
+            category=self.category,
+            total_reviews=3,
+        )
+        Product.objects.create(
+            name="Carregador USB",
+            description="Carregador",
+            price=20.00,
+            total_reviews=10,
+        )
+
+    def tearDown(self):
+        suggestion_index.clear()
+
+    def suggest(self, query, **params):
+        response = self.client.get("/api/v2/product/suggest/", {"q": query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(r["type"], r["name"]) for r in response.data["results"]]
+
+    def test_prefix_match_ordered_by_popularity(self):
+        self.assertEqual(
+            self.suggest("ca"),
+            [("product", "Carregador USB"), ("product", "Cabo HDMI")],
+        )
+
+    def test_matches_any_word_and_ignores_accents(self):
+        self.assertEqual(self.suggest("hd"), [("product", "Cabo HDMI")])
+        self.assertEqual(self.suggest("acess"), [("category", "Acessórios")])
+
+    def test_limit(self):
+        self.assertEqual(len(self.suggest("ca", limit=1)), 1)
+
+    def test_served_without_queries_once_built(self):
+        self.suggest("ca")
+        with self.assertNumQueries(0):
+            self.suggest("cab")
+
+    def test_index_follows_product_signals(self):
+        self.suggest("ca")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                name="Câmara Web", description="Webcam", price=40.00
+            )
+        self.assertIn(("product", "Câmara Web"), self.suggest("cam"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual(self.suggest("cam"), [])
+
+    def test_stale_index_served_while_another_request_rebuilds(self):
+        self.suggest("ca")
+        suggestion_index._built_at -= settings.PRODUCT_SUGGEST_TTL + 1
+
+        with suggestion_index._build_lock, self.assertNumQueries(0):
+            self.assertEqual(self.suggest("hd"), [("product", "Cabo HDMI")])
+
+    def test_updates_during_rebuild_are_kept(self):
+        self.suggest("ca")
+        load = suggestion_index._load
+
+        def load_then_save():
+            result = load()
+            # A product committed after the rebuild read the table.
+            product = Product(
+                pk=999999, name="Câmara Web", slug="camara-web", total_reviews=0
+            )
+            suggestion_index.add_product(product)
+            return result
+
+        with mock.patch.object(suggestion_index, "_load", load_then_save):
+            suggestion_index.rebuild()
+        self.assertEqual(self.suggest("cam"), [("product", "Câmara Web")])
+
+    def test_category_ranking_follows_product_count(self):
+        perfumes = Category.objects.create(name="Perfumes")
+        peripherals = Category.objects.create(name="Periféricos")
+        Product.objects.create(
+            name="Colónia", description="", price=30.00, category=perfumes
+        )
+        self.assertEqual(
+            [name for _, name in self.suggest("per")], ["Perfumes", "Periféricos"]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in ("Rato", "Teclado"):
+                Product.objects.create(
+                    name=name, description="", price=10.00, category=peripherals
+                )
+        self.assertEqual(
+            [name for _, name in self.suggest("per")], ["Periféricos", "Perfumes"]
+        )
+
+    def test_missing_query(self):
+        response = self.client.get("/api/v2/product/suggest/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("error", response.data)
+
+
+class ImportCatalogCommandTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        Product.objects.create(name="Cabo HDMI", description="Antigo", price=10)
+
+    def write(self, filename, content):
+        path = Path(self.tmpdir.name) / filename
+        path.write_text(content, encoding="utf-8")
+        return path
+
+    def test_import_csv(self):
+        path = self.write(
+            "catalog.csv",
+            "name,description,price,category,featured\n"
+            "Cabo HDMI,Cabo de 2m,12.50,Acessórios,true\n"
+            "Cabo HDMI,Cabo de 5m,18.00,Acessórios,false\n"
+            "Monitor,Monitor 27,250.00,Ecrãs,true\n",
+        )
+
+        call_command("import_catalog", str(path), batch_size=2, stdout=StringIO())
+
+        self.assertEqual(
+            sorted(Product.objects.values_list("slug", flat=True)),
+            ["cabo-hdmi", "cabo-hdmi-1", "cabo-hdmi-2", "monitor"],
+        )
+        self.assertEqual(Category.objects.count(), 2)
+        monitor = Product.objects.get(slug="monitor")
+        self.assertEqual(monitor.category.name, "Ecrãs")
+        self.assertEqual(monitor.excerpt, "Monitor 27")
+        self.assertFalse(Product.objects.get(slug="cabo-hdmi-2").featured)
+
+        response = APIClient().get("/api/v2/product/search/", {"query": "ecras"})
+        self.assertEqual([p["slug"] for p in response.data["results"]], ["monitor"])
+
+    def test_rows_with_slug_are_upserted(self):
+        path = self.write(
+            "catalog.jsonl",
+            '{"slug": "cabo-hdmi", "name": "Cabo HDMI", "price": "9.99", '
+            '"description": "Novo"}\n',
+        )
+
+        call_command("import_catalog", str(path), stdout=StringIO())
+
+        product = Product.objects.get()
+        self.assertEqual(product.description, "Novo")
+        self.assertEqual(str(product.price), "9.99")
+
+    def test_failed_import_resumes_after_last_batch(self):
+        path = self.write(
+            "catalog.csv",
+            "name,description,price\n"
+            "Rato,Rato sem fios,15\n"
+            "Teclado,Teclado,oops\n",
+        )
+
+        with self.assertRaises(CommandError):
+            call_command("import_catalog", str(path), batch_size=1, stdout=StringIO())
+        self.assertTrue(Product.objects.filter(slug="rato").exists())
+
+        self.write(
+            "catalog.csv",
+            "name,description,price\n"
+            "Rato,Rato sem fios,15\n"
+            "Teclado,Teclado,30\n",
+        )
+        call_command(
+            "import_catalog", str(path), batch_size=1, resume=True, stdout=StringIO()
+        )
+
+        self.assertEqual(Product.objects.filter(name="Rato").count(), 1)
+        self.assertTrue(Product.objects.filter(slug="teclado").exists())
+        self.assertFalse(Path(f"{path}.checkpoint").exists())
+
+    def test_empty_featured_means_featured(self):
+        path = self.write(
+            "catalog.csv", "name,price,featured\nRato,15,\nTeclado,30,no\n"
+        )
+
+        call_command("import_catalog", str(path), stdout=StringIO())
+
+        self.assertTrue(Product.objects.get(slug="rato").featured)
+        self.assertFalse(Product.objects.get(slug="teclado").featured)
+
+    def test_invalid_prices_rejected(self):
+        for price in ["NaN", "Infinity", "-inf", "-1", "sNaN", ""]:
+            with self.subTest(price=price):
+                path = self.write("catalog.csv", f"name,price\nRato,{price}\n")
+                with self.assertRaisesMessage(CommandError, "invalid price"):
+                    call_command("import_catalog", str(path), stdout=StringIO())
+        self.assertFalse(Product.objects.filter(name="Rato").exists())
+
+    def test_resume_after_commit_does_not_duplicate(self):
+        path = self.write("catalog.csv", "name,price\nRato,15\nTeclado,30\n")
+
+        # The process dies after the first batch commits, before its
+        # checkpoint is updated.
+        with mock.patch(
+            "apps.products.management.commands.import_catalog.bump_catalog_version",
+            side_effect=KeyboardInterrupt,
+        ):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command(
+                    "import_catalog", str(path), batch_size=1, stdout=StringIO()
+                )
+        call_command(
+            "import_catalog", str(path), batch_size=1, resume=True, stdout=StringIO()
+        )
+
+        self.assertEqual(
+            sorted(Product.objects.values_list("slug", flat=True)),
+            ["cabo-hdmi", "rato", "teclado"],
+        )
+
+    def test_new_rows_never_overwrite_concurrent_products(self):
+        path = self.write("catalog.csv", "name,price\nRato,15\n")
+        resolve = Command.resolve_categories
+
+        def create_concurrently(command, names):
+            # Another writer takes the slug after the snapshot was loaded.
+            Product.objects.create(name="Rato", description="Outro", price=99)
+            resolve(command, names)
+
+        with mock.patch.object(Command, "resolve_categories", create_concurrently):
+            call_command("import_catalog", str(path), stdout=StringIO())
+
+        self.assertEqual(Product.objects.get(slug="rato").description, "Outro")
+        self.assertEqual(Product.objects.get(slug="rato-1").price, 15)
+
+
+class SparseFieldsetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Electronics")
+        self.product = Product.objects.create(
+            name="Laptop",
+            description="A very long description " * 100,
+            price=999.99,
+            category=self.category,
+        )
+
+    def test_fields_limits_list_output(self):
+        response = self.client.get("/api/v2/product/", {"fields": "id,name,price"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data["results"][0]), ["id", "name", "price"])
+
+    def test_omit_drops_fields(self):
+        response = self.client.get("/api/v2/product/", {"omit": "excerpt"})
+        self.assertNotIn("excerpt", response.data["results"][0])
+        self.assertIn("image_srcset", response.data["results"][0])
+
+    def test_list_returns_excerpt_without_loading_description(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v2/product/")
+        result = response.data["results"][0]
+        self.assertNotIn("description", result)
+        self.assertEqual(result["excerpt"], self.product.excerpt)
+        self.assertFalse(
+            any('"description"' in query["sql"] for query in queries.captured_queries)
+        )
+
+    def test_unrequested_columns_are_not_loaded(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/v2/product/", {"omit": "excerpt"})
+        self.assertFalse(
+            any('"excerpt"' in query["sql"] for query in queries.captured_queries)
+        )
+
+    def test_search_and_category_detail(self):
+        response = self.client.get(
+            "/api/v2/product/search/", {"query": "Laptop", "fields": "name"}
+        )
+        self.assertEqual(response.data["results"], [{"name": "Laptop"}])
+
+        response = self.client.get(
+            f"/api/v2/product/categories/{self.category.slug}/",
+            {"fields": "slug"},
+        )
+        self.assertEqual(
+            response.data["products"]["results"], [{"slug": self.product.slug}]
+        )
+
+    def test_product_detail(self):
+        response = self.client.get(
+            f"/api/v2/product/{self.product.slug}/", {"omit": "description,category"}
+        )
+        self.assertNotIn("description", response.data)
+        self.assertNotIn("category", response.data)
+        self.assertEqual(response.data["name"], "Laptop")
+
+    def test_unknown_field(self):
+        response = self.client.get("/api/v2/product/", {"fields": "name,secret"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("secret", response.data["error"])
+
+
+class FastSerializerTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmpdir.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client = APIClient()
+
+        self.category = Category.objects.create(name="Electronics")
+        Product.objects.create(
+            name="Laptop",
+            description="<p>Fast &amp; light</p>",
+            price="999.9",
+            category=self.category,
+            image=make_image(),
+            average_rating=4.25,
+            total_reviews=3,
+        )
+        Product.objects.create(
+            name="Mouse", description="Mouse", price=25, category=self.category
+        )
+
+    def test_rows_match_product_list_serializer(self):
+        for fields, omit in [(None, None), ({"name", "price"}, None), (None, {"id"})]:
+            fast = FastProductList(fields, omit)
+            drf = ProductListSerializer(
+                Product.objects.all(), many=True, fields=fields, omit=omit
+            )
+            self.assertEqual(
+                JSONRenderer().render(fast.rows(fast.values(Product.objects.all()))),
+                JSONRenderer().render(drf.data),
+            )
+
+    def test_endpoints_return_identical_bytes(self):
+        urls = [
+            "/api/v2/product/",
+            "/api/v2/product/?fields=name,image_srcset,price",
+            "/api/v2/product/?pagination=cursor&page_size=1",
+            "/api/v2/product/search/?query=laptop",
+            f"/api/v2/product/categories/{self.category.slug}/",
+        ]
+        for url in urls:
+            with override_settings(FAST_SERIALIZERS=False):
+                expected = self.client.get(url)
+            with override_settings(FAST_SERIALIZERS=True):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.content, expected.content, url)
+
+
+@skipUnless(find_spec("orjson"), "orjson is not installed")
+class ORJSONRendererTest(TestCase):
+    def test_same_bytes_as_json_renderer(self):
+        product = Product.objects.create(
+            name="Laptop", description="Laptop", price="999.90", average_rating=4.25
+        )
+        samples = [
+            ProductListSerializer(Product.objects.all(), many=True).data,
+            {
+                "price": Decimal("12.50"),
+                "aware": timezone.now(),
+                "utc": datetime.datetime(2025, 1, 2, 3, 4, 5, 6, datetime.timezone.utc),
+                "naive": datetime.datetime(2025, 1, 2, 3, 4, 5),
+                "date": datetime.date(2025, 1, 2),
+                "time": datetime.time(3, 4, 5),
+                "duration": datetime.timedelta(minutes=90),
+                "lazy": gettext_lazy("Produto não encontrado."),
+                "uuid": uuid.UUID(int=product.id),
+                "queryset": Product.objects.values_list("name", flat=True),
+                "separators": "a\u2028b\u2029c",
+                1: [None, True, 1.5],
+            },
+            # Falls back to JSONRenderer.
+            {"big": 2**70},
+            # Django's ErrorList keeps its messages outside the list storage.
+            ProductFilter({"min_price": "abc"}).errors,
+            ErrorList(["Erro."]),
+            {"safe": mark_safe("<b>"), "status": HTTPStatus.BAD_REQUEST},
+        ]
+        for data in samples:
+            self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            ORJSONRenderer().render(samples[0], "application/json; indent=4"),
+            JSONRenderer().render(samples[0], "application/json; indent=4"),
+        )
+
+    def test_parser(self):
+        body = '{"name": "Ecrã", "quantity": 2, "price": 1.5}'.encode()
+        self.assertEqual(
+            ORJSONParser().parse(BytesIO(body)),
+            {"name": "Ecrã", "quantity": 2, "price": 1.5},
+        )
+        for invalid in [b"{", b'{"price": NaN}']:
+            with self.assertRaises(ParseError):
+                ORJSONParser().parse(BytesIO(invalid))
+        self.assertEqual(
+            ORJSONParser().parse(
+                BytesIO('{"a": "é"}'.encode("latin-1")),
+                parser_context={"encoding": "latin-1"},
+            ),
+            {"a": "é"},
+        )
+
+    def test_used_by_api(self):
+        response = APIClient().get("/api/v2/product/")
+        self.assertIsInstance(response.accepted_renderer, ORJSONRenderer)
+
+    def test_filter_errors_keep_their_messages(self):
+        response = APIClient().get("/api/v2/product/", {"min_price": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.json()["min_price"]), 1)
+
+
+class CompressionMiddlewareTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for i in range(20):
+            Product.objects.create(
+                name=f"Product {i}", description="Description", price=10 + i
+            )
+        self.plain = self.client.get("/api/v2/product/").content
+        cache.clear()
+
+    @skipUnless(find_spec("brotli"), "brotli is not installed")
+    def test_brotli_preferred(self):
+        response = self.client.get(
+            "/api/v2/product/", HTTP_ACCEPT_ENCODING="gzip, deflate, br"
+        )
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        self.assertEqual(brotli.decompress(response.content), self.plain)
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+
+    def test_gzip_fallback(self):
+        response = self.client.get(
+            "/api/v2/product/", HTTP_ACCEPT_ENCODING="br;q=0, gzip"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), self.plain)
+
+        with mock.patch("infostore.middleware.brotli", None):
+            response = self.client.get(
+                "/api/v2/product/", HTTP_ACCEPT_ENCODING="br, gzip"
+            )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_not_compressed(self):
+        response = self.client.get("/api/v2/product/")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+        with override_settings(COMPRESSION_MIN_SIZE=10**6):
+            response = self.client.get("/api/v2/product/", HTTP_ACCEPT_ENCODING="br")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_weak_etag_still_matches(self):
+        response = self.client.get("/api/v2/product/", HTTP_ACCEPT_ENCODING="gzip")
+        response = self.client.get(
+            "/api/v2/product/",
+            HTTP_ACCEPT_ENCODING="gzip",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_html_not_compressed(self):
+        # Admin and browsable API pages carry CSRF tokens under a session
+        # cookie (BREACH).
+        request = RequestFactory().get("/admin/login/", HTTP_ACCEPT_ENCODING="gzip")
+        response = CompressionMiddleware(
+            lambda request: HttpResponse(
+                "<form>" * 1000, content_type="text/html; charset=utf-8"
+            )
+        )(request)
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    @skipUnless(find_spec("brotli"), "brotli is not installed")
+    def test_compressed_body_cached_per_body(self):
+        with mock.patch.object(
+            middleware, "compress_body", wraps=middleware.compress_body
+        ) as compress:
+            for _ in range(3):
+                response = self.client.get(
+                    "/api/v2/product/", HTTP_ACCEPT_ENCODING="br"
+                )
+                self.assertEqual(brotli.decompress(response.content), self.plain)
+            self.assertEqual(compress.call_count, 1)
+
+            # Even when the ETag misses the change, the new body is served.
+            with mock.patch("apps.products.views.catalog_version", lambda *a: "v"):
+                response = self.client.get(
+                    "/api/v2/product/", HTTP_ACCEPT_ENCODING="br"
+                )
+                etag = response["ETag"]
+                Product.objects.create(name="New", description="New", price=1)
+                response = self.client.get(
+                    "/api/v2/product/", HTTP_ACCEPT_ENCODING="br"
+                )
+            self.assertEqual(response["ETag"], etag)
+            self.assertEqual(compress.call_count, 2)
+            self.assertIn(b"New", brotli.decompress(response.content))
+
+    def test_streaming_response(self):
+        chunks = [b'{"rows": [', *[b'"row",' for _ in range(1000)], b'"end"]}']
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+        response = CompressionMiddleware(
+            lambda request: StreamingHttpResponse(
+                iter(chunks), content_type="application/json"
+            )
+        )(request)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertFalse(response.has_header("Content-Length"))
+        body = b"".join(response.streaming_content)
+        self.assertEqual(gzip.decompress(body), b"".join(chunks))
+
+
+class RelatedProductsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.a, self.b, self.c, self.d = [
+            Product.objects.create(name=name, description=name, price=10)
+            for name in ["Laptop", "Mouse", "Bag", "Cable"]
+        ]
+        for basket, order_status in [
+            ([self.a, self.b], "delivered"),
+            ([self.a, self.b, self.c], "pending"),
+            ([self.a, self.c], "shipped"),
+            ([self.d], "delivered"),
+            ([self.a, self.d], "cancelled"),
+        ]:
+            order = Order.objects.create(
+                total_amount=10, shipping_address={}, status=order_status
+            )
+            for product in basket:
+                OrderItem.objects.create(order=order, product=product, price=10)
+
+    def related(self, product):
+        response = self.client.get(f"/api/v2/product/{product.slug}/related/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [p["name"] for p in response.data["results"]]
+
+    def test_top_neighbours_by_co_purchase(self):
+        call_command("compute_related_products", stdout=StringIO())
+        self.assertEqual(self.related(self.b), ["Laptop", "Bag"])
+        self.assertEqual(self.related(self.a), ["Bag", "Mouse"])
+        # The cancelled order does not count.
+        self.assertEqual(self.related(self.d), [])
+
+        call_command("compute_related_products", top=1, min_orders=2, stdout=StringIO())
+        self.assertEqual(self.related(self.b), ["Laptop"])
+        self.assertEqual(self.related(self.c), ["Laptop"])
+
+    def test_single_query_lookup(self):
+        call_command("compute_related_products", stdout=StringIO())
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                f"/api/v2/product/{self.a.slug}/related/", {"fields": "slug"}
+            )
+        self.assertEqual(
+            response.data["results"], [{"slug": self.c.slug}, {"slug": self.b.slug}]
+        )
+
+    def test_unknown_product(self):
+        response = self.client.get("/api/v2/product/nonexistent/related/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProductScoresTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        user = get_user_model().objects.create_user(
+            username="scorer", email="scorer@example.com", password="password123"
+        )
+        self.a, self.b, self.c, self.d = [
+            Product.objects.create(name=name, description=name, price=10)
+            for name in ["Laptop", "Mouse", "Bag", "Cable"]
+        ]
+        # Laptop: 5 units a month ago. Mouse: 2 units and a wishlist entry
+        # today. Bag: a review today. Cable: a cancelled order only.
+        for product, quantity, order_status in [
+            (self.a, 5, "delivered"),
+            (self.b, 2, "pending"),
+            (self.d, 9, "cancelled"),
+        ]:
+            order = Order.objects.create(
+                total_amount=10, shipping_address={}, status=order_status
+            )
+            OrderItem.objects.create(
+                order=order, product=product, price=10, quantity=quantity
+            )
+        Order.objects.filter(items__product=self.a).update(
+            created_at=timezone.now() - datetime.timedelta(days=30)
+        )
+        Wishlist.objects.create(user=user, product=self.b)
+        Review.objects.create(product=self.c, user=user, rating=5, comment="Boa")
+
+    def compute(self):
+        out = StringIO()
+        call_command("compute_product_scores", stdout=out)
+        return out.getvalue()
+
+    def names(self, **params):
+        response = self.client.get("/api/v2/product/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [p["name"] for p in response.data["results"]]
+
+    def test_scores(self):
+        self.compute()
+        scores = dict(Product.objects.values_list("name", "popularity_score"))
+        self.assertEqual(scores, {"Laptop": 5, "Mouse": 2.5, "Bag": 2, "Cable": 0})
+        self.a.refresh_from_db()
+        self.b.refresh_from_db()
+        # A month is ten half-lives of 72 hours.
+        self.assertAlmostEqual(self.a.trending_score, 5 / 1024, places=3)
+        self.assertAlmostEqual(self.b.trending_score, 2.5, places=3)
+
+    def test_unchanged_scores_are_not_rewritten(self):
+        # Cable keeps its default 0.
+        self.assertIn("of 3 products", self.compute())
+        self.assertIn("of 0 products", self.compute())
+
+    def test_scores_only_move_score_sort_etags(self):
+        updated_at = dict(Product.objects.values_list("id", "updated_at"))
+        newest = self.client.get("/api/v2/product/")["ETag"]
+        popular = self.client.get("/api/v2/product/", {"sort": "popular"})["ETag"]
+
+        self.compute()
+        self.assertEqual(
+            dict(Product.objects.values_list("id", "updated_at")), updated_at
+        )
+        response = self.client.get("/api/v2/product/", HTTP_IF_NONE_MATCH=newest)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(
+            "/api/v2/product/", {"sort": "popular"}, HTTP_IF_NONE_MATCH=popular
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_small_score_drift_is_not_written(self):
+        self.compute()
+        # 0.5%, less than an hour of decay with the 72 hour half-life.
+        Product.objects.filter(pk=self.b.pk).update(trending_score=2.5 * 1.005)
+        self.assertIn("of 0 products", self.compute())
+
+    def test_sort(self):
+        self.compute()
+        self.assertEqual(self.names(), ["Cable", "Bag", "Mouse", "Laptop"])
+        self.assertEqual(self.names(sort="popular"), ["Laptop", "Mouse", "Bag", "Cable"])
+        self.assertEqual(
+            self.names(sort="trending"), ["Mouse", "Bag", "Laptop", "Cable"]
+        )
+
+    def test_sort_with_cursor_pagination(self):
+        self.compute()
+        for fast in (False, True):
+            with self.subTest(fast=fast), self.settings(FAST_SERIALIZERS=fast):
+                response = self.client.get(
+                    "/api/v2/product/",
+                    {"sort": "trending", "pagination": "cursor", "page_size": 2},
+                )
+                names = [p["name"] for p in response.data["results"]]
+                response = self.client.get(response.data["next"])
+                names += [p["name"] for p in response.data["results"]]
+                self.assertEqual(names, ["Mouse", "Bag", "Laptop", "Cable"])
+                self.assertIsNone(response.data["next"])
+
+    def test_cursor_pages_through_tied_scores_without_offset(self):
+        # Cable and ten more products all tie at a popularity of 0.0.
+        Product.objects.bulk_create(
+            [
+                Product(name=f"Extra {index}", slug=f"extra-{index}", price=1)
+                for index in range(10)
+            ]
+        )
+        self.compute()
+        expected = list(
+            Product.objects.order_by("-popularity_score", "-id").values_list(
+                "name", flat=True
+            )
+        )
+
+        for fast in (False, True):
+            with self.subTest(fast=fast), self.settings(FAST_SERIALIZERS=fast):
+                pages = []
+                url = "/api/v2/product/?sort=popular&pagination=cursor&page_size=3"
+                with CaptureQueriesContext(connection) as queries:
+                    while url:
+                        response = self.client.get(url)
+                        pages.append([p["name"] for p in response.data["results"]])
+                        url = response.data["next"]
+                self.assertEqual([name for page in pages for name in page], expected)
+                self.assertFalse(
+                    any("OFFSET" in query["sql"] for query in queries.captured_queries)
+                )
+
+                response = self.client.get(response.data["previous"])
+                self.assertEqual(
+                    [p["name"] for p in response.data["results"]], pages[-2]
+                )
+
+    def test_invalid_sort(self):
+        response = self.client.get("/api/v2/product/", {"sort": "price"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("error", response.data)
+
+    def test_suggestions_rank_by_popularity(self):
+        self.compute()
+        Product.objects.filter(pk=self.c.pk).update(name="Bag for Laptop")
+        suggestion_index.rebuild()
+        names = [s["name"] for s in suggestion_index.suggest("lap")]
+        self.assertEqual(names, ["Laptop", "Bag for Laptop"])
+
+
+def make_image(name="photo.png", size=(1200, 900)):
+    buffer = BytesIO()
+    Image.new("RGB", size, "navy").save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class ImageDerivativesTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmpdir.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client = APIClient()
+
+    def test_upload_generates_derivatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                name="Laptop", description="Laptop", price=999.99, image=make_image()
+            )
+            # Not inside the transaction.
+            self.assertEqual(product.image_variants, {})
+
+        product.refresh_from_db()
+        self.assertEqual(sorted(product.image_variants), ["jpeg", "webp"])
+        self.assertEqual(sorted(product.image_variants["webp"]), ["200", "400", "800"])
+        with default_storage.open(product.image_variants["jpeg"]["400"]) as handle:
+            self.assertEqual(Image.open(handle).size, (400, 300))
+
+    def test_small_images_are_not_upscaled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                name="Icon",
+                description="Icon",
+                price=1,
+                image=make_image(size=(300, 300)),
+            )
+        self.assertEqual(list(product.image_variants["webp"]), ["200"])
+
+    def test_srcset_in_list_and_detail(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                name="Laptop", description="Laptop", price=999.99, image=make_image()
+            )
+
+        response = self.client.get("/api/v2/product/")
+        srcset = response.data["results"][0]["image_srcset"]
+        self.assertIn("webp", srcset)
+        self.assertTrue(srcset["jpeg"].endswith("_800w.jpeg 800w"))
+
+        response = self.client.get(f"/api/v2/product/{product.slug}/")
+        self.assertEqual(response.data["image_srcset"], srcset)
+
+    def test_failed_derivatives_do_not_break_the_save(self):
+        product = Product.objects.create(name="Laptop", description="", price=1)
+        self.client.get(f"/api/v2/product/{product.slug}/")
+        version = catalog_version()
+
+        with mock.patch(
+            "apps.products.images.generate_derivatives", side_effect=OSError("disk")
+        ):
+            with self.assertLogs("apps.products.signals", "ERROR"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    product.image = make_image()
+                    product.price = 2
+                    product.save()
+
+        # The callbacks registered after it still ran.
+        self.assertNotEqual(catalog_version(), version)
+        response = self.client.get(f"/api/v2/product/{product.slug}/")
+        self.assertEqual(response.data["price"], "2.00")
+
+    def test_saves_without_the_image_keep_derivatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                name="Laptop", description="Laptop", price=999.99, image=make_image()
+            )
+
+        with mock.patch("apps.products.images.generate_derivatives") as generate:
+            with self.captureOnCommitCallbacks(execute=True):
+                deferred = Product.objects.defer("image").get(pk=product.pk)
+                deferred.price = 899
+                deferred.save()
+
+                fresh = Product.objects.get(pk=product.pk)
+                fresh.image = None
+                fresh.price = 799
+                fresh.save(update_fields=["price"])
+        generate.assert_not_called()
+
+    def test_product_without_image_has_empty_srcset(self):
+        Product.objects.create(name="Laptop", description="Laptop", price=999.99)
+        response = self.client.get("/api/v2/product/")
+        self.assertEqual(response.data["results"][0]["image_srcset"], {})
+
+    def test_backfill_command(self):
+        product = Product.objects.create(
+            name="Laptop", description="Laptop", price=999.99, image=make_image()
+        )
+        Product.objects.filter(pk=product.pk).update(image_variants={})
+
+        call_command("generate_thumbnails", workers=1, stdout=StringIO())
+
+        product.refresh_from_db()
+        self.assertEqual(len(product.image_variants["jpeg"]), 3)
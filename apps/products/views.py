@@ -1,54 +1,167 @@
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
-from django.db.models import Q
+from django.conf import settings
+from django.db.models import Count, Max
+from infostore.conditional import make_etag, not_modified, set_validators
+from .cache import SCORES_VERSION_KEY, catalog_version, get_product_detail
+from .fast import FastProductList
+from .filters import ProductFilter, facet_counts
 from .models import Category, Product
+from .pagination import ProductPagination, get_product_paginator
+from .search import search_products
 from .serializers import (
     CategoryDetailSerialiizer,
     CategoryListSerialiizer,
     ProductDetailSerializer,
     ProductListSerializer,
+    sparse_fieldset,
 )
+from .suggest import suggestion_index
 
 
-class ProductPagination(PageNumberPagination):
-    page_size = 20
-    page_size_query_param = "page_size"
-    max_page_size = 100
+# ``?sort=`` values of product_list; the id breaks ties. Each has an index.
+PRODUCT_SORTS = {
+    "newest": ("-id",),
+    "popular": ("-popularity_score", "-id"),
+    "trending": ("-trending_score", "-id"),
+}
+# Sorts by the compute_product_scores columns, versioned by their own key.
+SCORE_SORTS = {"popular", "trending"}
+
+
+def product_projection(queryset, fields=None, omit=None, ordering=()):
+    """
+    Restrict ``queryset`` to the columns the product list output needs and
+    return it with the function that serializes a page of it: the
+    ``FastProductList`` fast path over ``.values()`` rows when
+    ``settings.FAST_SERIALIZERS`` is on, ``ProductListSerializer`` otherwise.
+    The ``ordering`` columns are loaded too, for cursor pagination.
+    """
+    ordering_columns = [field.lstrip("-") for field in ordering]
+    if settings.FAST_SERIALIZERS:
+        fast = FastProductList(fields, omit)
+        extra = [column for column in ordering_columns if column not in fast.columns]
+        return fast.values(queryset, *extra), fast.rows
+
+    def serialize(page):
+        return ProductListSerializer(page, many=True, fields=fields, omit=omit).data
+
+    columns = ProductListSerializer.only_columns(fields, omit)
+    columns += [column for column in ordering_columns if column not in columns]
+    return queryset.only(*columns), serialize
 
 
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def product_list(request):
-    products = Product.objects.filter(featured=True).select_related("category")
-    paginator = ProductPagination()
+    try:
+        fields, omit = sparse_fieldset(request, ProductListSerializer)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    sort = request.query_params.get("sort", "newest")
+    ordering = PRODUCT_SORTS.get(sort)
+    if ordering is None:
+        return Response(
+            {"error": "Ordenação inválida."}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    params = request.query_params.copy()
+    params.setdefault("featured", "true")
+    filterset = ProductFilter(params, queryset=Product.objects.all())
+    if not filterset.is_valid():
+        return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+    products, serialize = product_projection(
+        filterset.qs.order_by(*ordering), fields, omit, ordering
+    )
+    with_facets = request.query_params.get("facets") in ("true", "1")
+
+    version = [catalog_version()]
+    if sort in SCORE_SORTS:
+        version.append(catalog_version(SCORES_VERSION_KEY))
+    if with_facets:
+        # The category facet shows category names and slugs; cover writes
+        # that skip the signals too (a few rows, one indexed aggregate).
+        version.append(Category.objects.aggregate(Max("updated_at"))["updated_at__max"])
+    etag = make_etag(request, *version)
+    response = not_modified(request, etag)
+    if response:
+        return response
+
+    paginator = get_product_paginator(request, ordering=ordering)
     result_page = paginator.paginate_queryset(products, request)
-    serializer = ProductListSerializer(result_page, many=True)
-    return paginator.get_paginated_response(serializer.data)
+    response = paginator.get_paginated_response(serialize(result_page))
+    if with_facets:
+        response.data["facets"] = facet_counts(filterset)
+    return set_validators(response, etag)
 
 
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def product_detail(request, slug):
     try:
-        products = Product.objects.get(slug=slug)
-        serializer = ProductDetailSerializer(products)
-        return Response(serializer.data)
+        fields, omit = sparse_fieldset(request, ProductDetailSerializer)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        data, last_modified = get_product_detail(slug)
     except Product.DoesNotExist:
         return Response(
             {"error": "Produto não encontrado."}, status=status.HTTP_404_NOT_FOUND
         )
+    if fields or omit:
+        # The cached entry is the full representation; trim it.
+        selected = ProductDetailSerializer.selected_fields(fields, omit)
+        data = {name: data[name] for name in selected}
+
+    etag = make_etag(request, last_modified)
+    response = not_modified(request, etag, last_modified)
+    if response:
+        return response
+    return set_validators(Response(data), etag, last_modified)
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def product_related(request, slug):
+    try:
+        fields, omit = sparse_fieldset(request, ProductListSerializer)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Precomputed by compute_related_products: one indexed lookup.
+    products, serialize = product_projection(
+        Product.objects.filter(recommended_with__product__slug=slug).order_by(
+            "recommended_with__rank"
+        ),
+        fields,
+        omit,
+    )
+    results = serialize(products)
+    if not results and not Product.objects.filter(slug=slug).exists():
+        return Response(
+            {"error": "Produto não encontrado."}, status=status.HTTP_404_NOT_FOUND
+        )
+    return Response({"results": results})
 
 
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def category_list(request):
     try:
-        categories = Category.objects.all()
+        # Product counts change when products are added, moved or deleted,
+        # which moves the catalog version as well.
+        etag = make_etag(request, catalog_version())
+        response = not_modified(request, etag)
+        if response:
+            return response
+
+        categories = Category.objects.annotate(product_count=Count("products"))
         serializer = CategoryListSerialiizer(categories, many=True)
-        return Response(serializer.data)
+        return set_validators(Response(serializer.data), etag)
     except Category.DoesNotExist:
         Response(
             {"error": "Categorias não encontrado."}, status=status.HTTP_404_NOT_FOUND
@@ -58,15 +171,34 @@ def category_list(request):
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def category_detail(request, slug):
+    try:
+        fields, omit = sparse_fieldset(request, ProductListSerializer)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     try:
         category = Category.objects.get(slug=slug)
-        serializer = CategoryDetailSerialiizer(category)
-        return Response(serializer.data)
     except Category.DoesNotExist:
         return Response(
             {"error": "Categoria não encontrado."}, status=status.HTTP_404_NOT_FOUND
         )
 
+    products, serialize = product_projection(
+        Product.objects.filter(category=category), fields, omit
+    )
+
+    etag = make_etag(request, catalog_version())
+    response = not_modified(request, etag)
+    if response:
+        return response
+
+    paginator = get_product_paginator(request)
+    result_page = paginator.paginate_queryset(products, request)
+
+    data = CategoryDetailSerialiizer(category).data
+    data["products"] = paginator.get_paginated_response(serialize(result_page)).data
+    return set_validators(Response(data), etag)
+
 
 @api_view(["GET"])
 @permission_classes([AllowAny])
@@ -75,14 +207,33 @@ def product_search(request):
     if not query:
         return Response({"error": "Nenhuma consulta fornecida"}, status=400)
 
-    products = Product.objects.filter(
-        Q(name__icontains=query)
-        | Q(description__icontains=query)
-        | Q(category__name__icontains=query)
-    ).select_related("category")
+    try:
+        fields, omit = sparse_fieldset(request, ProductListSerializer)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    products, serialize = product_projection(
+        search_products(Product.objects.all(), query), fields, omit
+    )
 
     paginator = ProductPagination()
     result_page = paginator.paginate_queryset(products, request)
 
-    serializer = ProductListSerializer(result_page, many=True)
-    return paginator.get_paginated_response(serializer.data)
+    return paginator.get_paginated_response(serialize(result_page))
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def product_suggest(request):
+    query = request.query_params.get("q")
+    if not query:
+        return Response({"error": "Nenhuma consulta fornecida"}, status=400)
+
+    try:
+        limit = min(int(request.query_params.get("limit", 10)), 20)
+    except ValueError:
+        return Response(
+            {"error": "Limite inválido."}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response({"results": suggestion_index.suggest(query, limit=max(limit, 1))})
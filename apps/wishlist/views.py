@@ -37,7 +37,11 @@ def add_to_wishlist(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_user_wishlist(request):
-    wishlist_itmes = Wishlist.objects.filter(user=request.user)
+    wishlist_itmes = (
+        Wishlist.objects.filter(user=request.user)
+        .select_related("user", "product")
+        .defer("product__description")
+    )
     serializer = WishListSerializer(wishlist_itmes, many=True)
     return Response(serializer.data)
 
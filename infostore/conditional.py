@@ -0,0 +1,52 @@
+"""
+Conditional GET helpers for the JSON API.
+
+Views compute a cheap version for what they are about to return (usually from
+indexed ``updated_at`` columns), check it with ``not_modified`` before doing
+any serialization, and stamp the validators on the real response with
+``set_validators``.
+"""
+
+import hashlib
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+
+def make_etag(request, *parts):
+    """
+    Build an ETag from version ``parts`` plus the request path and ``Accept``
+    header, since different pages and renderers yield different bodies.
+    """
+    source = "|".join(
+        [request.get_full_path(), request.META.get("HTTP_ACCEPT", "")]
+        + [str(part) for part in parts]
+    )
+    return quote_etag(hashlib.md5(source.encode()).hexdigest())
+
+
+def _timestamp(last_modified):
+    return int(last_modified.timestamp()) if last_modified else None
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Return a ``304 Not Modified`` response when the request's
+    ``If-None-Match`` / ``If-Modified-Since`` headers still match, else None.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=_timestamp(last_modified)
+    )
+    if isinstance(response, HttpResponseNotModified):
+        return set_validators(response, etag, last_modified)
+    return None
+
+
+def set_validators(response, etag, last_modified=None):
+    response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = http_date(_timestamp(last_modified))
+    return response
@@ -0,0 +1,193 @@
+"""
+Response compression for the JSON API.
+
+``CompressionMiddleware`` encodes JSON responses with brotli when the
+``brotli`` package is installed and the client accepts it, gzip otherwise.
+Static files are left to WhiteNoise, which serves them pre-compressed.
+
+- Bodies under ``COMPRESSION_MIN_SIZE`` bytes are sent as they are.
+- Streaming responses are compressed chunk by chunk as they are sent.
+- Responses to ``GET`` with an ``ETag`` (the catalog endpoints, see
+  ``infostore/conditional.py``) keep their compressed body in the cache, so a
+  repeated hit on an unchanged page is not compressed again. The key is a
+  hash of the uncompressed body rather than the ETag: a version that misses
+  a change can then cost a recompression, never a stale body.
+
+Unlike Django's ``GZipMiddleware`` no random padding is added against BREACH,
+which would defeat the compressed-body cache. That is only safe because the
+JSON API authenticates with bearer tokens, not cookies, so its responses do
+not echo a CSRF secret. HTML (the admin, the browsable API) does, under a
+session cookie, so it is never compressed here.
+"""
+
+import hashlib
+import zlib
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+# Dynamic responses favour speed; bodies that are cached are compressed once,
+# so they can afford a better ratio.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+CACHED_BROTLI_QUALITY = 9
+
+# JSON only; see the BREACH note above before adding anything.
+COMPRESSIBLE_TYPES = ("application/json",)
+
+
+def accepted_encodings(header):
+    """The codings in an ``Accept-Encoding`` header that have a non-zero q."""
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(header):
+    accepted = accepted_encodings(header)
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compressor(encoding, cached=False):
+    """An object with ``compress(data)`` and ``finish()`` for ``encoding``."""
+    if encoding == "br":
+        quality = CACHED_BROTLI_QUALITY if cached else BROTLI_QUALITY
+        return _BrotliCompressor(quality)
+    return _GzipCompressor()
+
+
+class _GzipCompressor:
+    def __init__(self):
+        # wbits=31: zlib stream with a gzip header and trailer.
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def compress_body(content, encoding, cached=False):
+    engine = compressor(encoding, cached)
+    return engine.compress(content) + engine.finish()
+
+
+def compress_stream(chunks, encoding):
+    engine = compressor(encoding)
+    for chunk in chunks:
+        data = engine.compress(chunk)
+        if data:
+            yield data
+    yield engine.finish()
+
+
+async def compress_async_stream(chunks, encoding):
+    engine = compressor(encoding)
+    async for chunk in chunks:
+        data = engine.compress(chunk)
+        if data:
+            yield data
+    yield engine.finish()
+
+
+def compressed_body_key(content, encoding):
+    # Hashing is far cheaper than compressing at CACHED_BROTLI_QUALITY.
+    return f"compressed:{encoding}:{hashlib.sha256(content).hexdigest()}"
+
+
+def weaken_etag(response):
+    # The encoded body differs byte for byte, so a strong ETag becomes weak
+    # (RFC 9110 8.8.1). If-None-Match compares weakly, so 304s keep working.
+    etag = response.get("ETag")
+    if etag and etag.startswith('"'):
+        response.headers["ETag"] = "W/" + etag
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if response.status_code == 304:
+            # Carry the same Vary and (weak) ETag the 200 would have had.
+            patch_vary_headers(response, ("Accept-Encoding",))
+            if choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+                weaken_etag(response)
+            return response
+        if response.status_code in (204, 206) or response.has_header(
+            "Content-Encoding"
+        ):
+            return response
+        if not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES):
+            return response
+        min_size = settings.COMPRESSION_MIN_SIZE
+        if not response.streaming and len(response.content) < min_size:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_async_stream(
+                    response.streaming_content, encoding
+                )
+            else:
+                response.streaming_content = compress_stream(
+                    response.streaming_content, encoding
+                )
+            # The compressed size is only known once the stream ends.
+            del response.headers["Content-Length"]
+        else:
+            etag = response.get("ETag")
+            cacheable = (
+                etag
+                and request.method == "GET"
+                and response.status_code == 200
+                and settings.COMPRESSION_CACHE_TIMEOUT
+            )
+            key = compressed_body_key(response.content, encoding) if cacheable else None
+            content = cache.get(key) if key else None
+            if content is None:
+                content = compress_body(response.content, encoding, cached=bool(key))
+                if len(content) >= len(response.content):
+                    return response
+                if key:
+                    cache.set(key, content, settings.COMPRESSION_CACHE_TIMEOUT)
+            response.content = content
+            response.headers["Content-Length"] = str(len(content))
+
+        weaken_etag(response)
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,25 @@
+"""
+orjson-backed JSON parser, a drop-in for DRF's ``JSONParser``.
+
+Bodies in any charset other than UTF-8 (orjson only reads UTF-8) go through
+``JSONParser``. Like ``STRICT_JSON``, ``NaN`` and ``Infinity`` are rejected;
+integers over 64 bits are read as floats.
+"""
+
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+
+class ORJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if encoding.lower().replace("_", "-") not in ("utf-8", "utf8"):
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
@@ -0,0 +1,65 @@
+"""
+orjson-backed JSON renderer.
+
+``ORJSONRenderer`` is a drop-in for DRF's ``JSONRenderer`` and produces the
+same bytes: every type orjson does not serialize natively (``Decimal``,
+lazy translation strings, ``timedelta``, querysets, ...) and every
+``datetime``/``date``/``time`` is handed to DRF's ``JSONEncoder.default``, so
+``COERCE_DECIMAL_TO_STRING`` and the ``Z`` suffix for UTC behave exactly as
+before. Indented output (``Accept: application/json; indent=4``), the non
+compact/ASCII settings and values orjson rejects (integers over 64 bits) fall
+back to ``JSONRenderer``. Unlike ``STRICT_JSON``, ``NaN`` renders as
+``null`` instead of raising.
+
+Subclasses of ``dict``, ``list``, ``str`` and ``int`` are converted through
+their own methods rather than read natively: orjson reads a ``list``
+subclass's storage directly, which is empty for Django's ``ErrorList`` (a
+``UserList`` that keeps its messages in ``.data``).
+"""
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_SUBCLASS
+    | orjson.OPT_NON_STR_KEYS
+)
+
+
+def _default(obj, encode=JSONEncoder().default):
+    # Subclasses (ReturnDict, ErrorList, SafeString, ...) arrive here; the
+    # plain values inside them are still serialized natively.
+    if isinstance(obj, dict):
+        return dict(obj)
+    if isinstance(obj, list):
+        return list(obj)
+    if isinstance(obj, str):
+        return str(obj)
+    if isinstance(obj, int):
+        return int(obj)
+    return encode(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Escape U+2028/U+2029 like JSONRenderer so the output stays a strict
+        # JavaScript subset.
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
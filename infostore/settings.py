@@ -1,3 +1,4 @@
+import importlib.util
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -50,6 +51,7 @@ MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # Add WhiteNoise
+    "infostore.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -83,9 +85,61 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Threads get a connection of their own, and an in-memory test
+        # database is private to one connection; a file lets the concurrency
+        # tests (e.g. ConcurrentCartAddTest) share it. Writers wait for the
+        # lock instead of failing at once.
+        "OPTIONS": {"timeout": 20},
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
+# Cache
+# A shared Redis cache in production (set REDIS_URL); per-process locmem
+# otherwise, which is also what the test suite runs against. Catalog ETag
+# versions and cached product details then check the database, since
+# management commands cannot reach another process's locmem.
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds a serialized product detail payload stays in the cache.
+PRODUCT_DETAIL_CACHE_TIMEOUT = int(os.getenv("PRODUCT_DETAIL_CACHE_TIMEOUT", 60 * 15))
+
+# Seconds before a worker fully rebuilds its autocomplete index, picking up
+# catalog writes made by other workers.
+PRODUCT_SUGGEST_TTL = int(os.getenv("PRODUCT_SUGGEST_TTL", 60 * 5))
+
+# API response compression (infostore/middleware.py): bodies smaller than
+# this many bytes are sent uncompressed, and compressed bodies of responses
+# with an ETag are cached for this many seconds (0 disables the cache).
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_CACHE_TIMEOUT = int(os.getenv("COMPRESSION_CACHE_TIMEOUT", 60 * 10))
+
+# Serialize product lists and carts with the hand-rolled fast path
+# (apps/products/fast.py, apps/cart/fast.py) instead of the DRF serializers.
+# Output is identical; see FastSerializerTest.
+FAST_SERIALIZERS = os.getenv("FAST_SERIALIZERS", "").lower() in ("true", "1", "yes")
+
+# Keep anonymous carts in a signed token held by the client (apps/cart/tokens.py)
+# instead of a Cart row; the token becomes a row when merged at login. Tokens
+# are accepted either way, this only decides what POST /cart/ hands out.
+STATELESS_CARTS = os.getenv("STATELESS_CARTS", "").lower() in ("true", "1", "yes")
+# Seconds a cart token stays valid.
+CART_TOKEN_MAX_AGE = int(os.getenv("CART_TOKEN_MAX_AGE", 60 * 60 * 24 * 30))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -141,6 +195,15 @@ APPEND_SLASH = False
 
 # Django REST Framework
 REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "rest_framework.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "rest_framework.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ],
@@ -157,6 +220,12 @@ REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
+# orjson renders and parses JSON several times faster with the same output
+# (see infostore/renderers.py); it is optional.
+if importlib.util.find_spec("orjson"):
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"][0] = "infostore.renderers.ORJSONRenderer"
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"][0] = "infostore.parsers.ORJSONParser"
+
 from datetime import timedelta
 
 SIMPLE_JWT = {
@@ -256,5 +325,10 @@ LOGGING = {
             "level": "INFO",
             "propagate": True,
         },
+        "apps": {
+            "handlers": ["file", "console"],
+            "level": "INFO",
+            "propagate": True,
+        },
     },
 }